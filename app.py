@@ -1,24 +1,48 @@
 import dash
+import flask
 from dash import dcc
 from dash import html
-from dash.dependencies import Input, Output, State
+from dash import no_update
+from dash.dependencies import Input, Output, State, ALL
 import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor
 import datetime
 import time
 import json
+import hashlib
 import random
 import asyncio
+import atexit
+import threading
+from collections import deque
 
 # --- CONFIGURAÇÕES E INICIALIZAÇÃO ---
 # 🚨 Em ambiente de produção, certifique-se de que utils/mailing_api.py está acessível
 from utils.mailing_api import get_active_campaign_metrics
+from utils.http_pool import close_http_clients
+from utils.metrics_store import record_samples, flush_samples, query_downsampled, query_events
+from utils.import_history import record_import, query_imports, get_history_version
+from utils.event_broker import publish_event, iter_event_stream, has_capacity
+from config.servers import load_server_registry, get_server_config
+
+# Servidores exibidos no painel (ordem do registro config/servers.json)
+SERVER_REGISTRY = load_server_registry()
+
+# Histórico de importações: a fonte é o SQLite (utils/import_history.py); em memória fica
+# só uma janela limitada das importações recentes deste processo (fallback se o banco falhar)
+IMPORT_LOG_RECENT_WINDOW = 50
+IMPORT_LOG_PAGE_SIZE = 20
 
 # Inicializa o Dash com o tema escuro (DARKLY) do Bootstrap
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY])
 server = app.server
 
+# Polling de fallback: as atualizações chegam por push (SSE em /events); o Interval só
+# cobre navegadores sem EventSource ou uma conexão de push caída
+POLLING_FALLBACK_INTERVAL_SECONDS = 60
+
 # Inicia o servidor web, usando o tema escuro (dbc.themes.DARKLY).
 
 
@@ -42,24 +66,33 @@ executor = ThreadPoolExecutor(max_workers=5)
 
 
 
+def _status_version(data: dict) -> str:
+    """
+    Versão do status = hash do próprio conteúdo: igual em qualquer processo e após um restart
+    (um contador por processo recomeçaria do zero e divergiria entre workers).
+    """
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
 # --- ESTRUTURA GLOBAL DE DADOS (CACHE) ---
 DASHBOARD_DATA = {
     # Status em tempo real (Será preenchido pela primeira chamada à API)
     'current_status': {
-        'MG': {"nome": "Aguardando API...", "progresso": "0%", "saidas": "0", "id": None},
-        'SP': {"nome": "Aguardando API...", "progresso": "0%", "saidas": "0", "id": None}
+        code: {"nome": "Aguardando API...", "progresso": "0%", "saidas": "0", "id": None}
+        for code in SERVER_REGISTRY
     },
-    'import_log': [],
-
-    # Armazenamento do conteúdo Base64 para MG e SP
-    'uploaded_content': {
-        'MG': None,
-        'SP': None
-    },
-    'uploaded_filename': {
-        'MG': None,
-        'SP': None
-    }
+    # Momento da última coleta do collector em segundo plano
+    'status_updated_at': None,
+    # Versão do status de cada servidor: só muda quando as métricas mudam (etag dos cartões)
+    'status_versions': {},
+    'import_log': deque(maxlen=IMPORT_LOG_RECENT_WINDOW),
+
+    # Armazenamento do conteúdo Base64 por servidor
+    'uploaded_content': {code: None for code in SERVER_REGISTRY},
+    'uploaded_filename': {code: None for code in SERVER_REGISTRY}
+}
+DASHBOARD_DATA['status_versions'] = {
+    code: _status_version(data) for code, data in DASHBOARD_DATA['current_status'].items()
 }
 
 # --- ESTILOS ---
@@ -70,6 +103,9 @@ UPLOAD_STYLE_BASE = {
 UPLOAD_STYLE_DASHED = {**UPLOAD_STYLE_BASE, 'borderStyle': 'dashed', 'borderColor': '#888'}
 UPLOAD_STYLE_SUCCESS = {**UPLOAD_STYLE_BASE, 'borderStyle': 'solid', 'borderColor': 'green'}
 
+# Cor da borda do upload a partir da cor Bootstrap do servidor no registro
+BORDER_COLORS = {'success': 'green', 'danger': 'red', 'warning': 'orange', 'info': 'deepskyblue', 'primary': 'royalblue'}
+
 # Cache Global. Armazena o conteúdo Base64 dos uploads (MG/SP)
 # e o histórico de logs. É o estado de memória que o dashboard usa.
 
@@ -84,25 +120,141 @@ UPLOAD_STYLE_SUCCESS = {**UPLOAD_STYLE_BASE, 'borderStyle': 'solid', 'borderColo
 # 2. FUNÇÕES DE INFRAESTRUTURA (BRIDGE PARA ASYNC)
 # ------------------------------------------------------------------
 
-def run_async_task(coro):
-    """Executa uma corotina em um thread (bridge para o httpx/asyncio)."""
-    loop = asyncio.new_event_loop()
+# Um único event loop de longa duração roda em um thread dedicado. Todos os callbacks
+# (e o coletor) submetem corotinas a ele; assim os clientes do pool HTTP são de fato
+# reaproveitados e nenhum loop/selector é criado (e vazado) por chamada.
+_ASYNC_LOOP = None
+_ASYNC_LOOP_THREAD = None
+_ASYNC_LOOP_LOCK = threading.Lock()
+
+
+def _run_loop_forever(loop):
     asyncio.set_event_loop(loop)
-    return loop.run_until_complete(coro)
+    loop.run_forever()
+
 
-# Envolve as funções async (API) para que o thread do Dash possa executá-las.
+def get_async_loop():
+    """Retorna o loop persistente da bridge, iniciando o thread na primeira chamada."""
+    global _ASYNC_LOOP, _ASYNC_LOOP_THREAD
+    with _ASYNC_LOOP_LOCK:
+        if _ASYNC_LOOP is None or not _ASYNC_LOOP_THREAD.is_alive():
+            _ASYNC_LOOP = asyncio.new_event_loop()
+            _ASYNC_LOOP_THREAD = threading.Thread(
+                target=_run_loop_forever, args=(_ASYNC_LOOP,), name="async-bridge", daemon=True
+            )
+            _ASYNC_LOOP_THREAD.start()
+        return _ASYNC_LOOP
 
 
+def submit_async_task(coro):
+    """Agenda a corotina no loop persistente (thread-safe). Retorna um concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_async_loop())
 
-def get_active_campaign_metrics_sync(server: str):
-    """Função SÍNCRONA que executa a chamada master de API para obter status real."""
-    import asyncio  # Necessário dentro da função
-    # Chama a função assíncrona real de coleta de métricas (Master API)
+
+def run_async_task(coro, timeout=None):
+    """Executa uma corotina no loop persistente e aguarda o resultado (bridge para o httpx/asyncio)."""
+    return submit_async_task(coro).result(timeout)
+
+
+@atexit.register
+def _shutdown_async_loop():
+    """Fecha os clientes do pool HTTP e para o loop da bridge ao encerrar o processo."""
+    flush_samples()
+    if _ASYNC_LOOP is None or not _ASYNC_LOOP.is_running():
+        return
     try:
-        return run_async_task(get_active_campaign_metrics(server))
-    except Exception as e:
-        print(f"ERRO CRÍTICO na coleta de métricas para {server}: {e}")
-        return {"nome": "ERRO API", "progresso": "N/A", "saidas": "N/A", "id": None}
+        run_async_task(close_http_clients(), timeout=5)
+    except Exception:
+        pass
+    _ASYNC_LOOP.call_soon_threadsafe(_ASYNC_LOOP.stop)
+
+
+
+# --- COLETOR DE MÉTRICAS EM SEGUNDO PLANO ---
+# Uma tarefa no loop persistente consulta todos os servidores no próprio ritmo e grava o snapshot
+# em DASHBOARD_DATA['current_status']. Os callbacks só leem esse snapshot, então a
+# latência do painel não depende mais da latência do discador.
+# O coletor sobe na primeira requisição, não no import: com app.run(debug=True) o processo
+# pai do reloader também importa este módulo e só o processo que serve deve coletar.
+METRICS_COLLECTOR_INTERVAL_SECONDS = 10
+STATUS_LOCK = threading.Lock()
+_COLLECTOR_FUTURE = None
+_COLLECTOR_START_LOCK = threading.Lock()
+
+
+async def _collect_metrics_forever():
+    history_version = None
+    while True:
+        results = await asyncio.gather(
+            *(get_active_campaign_metrics(code) for code in SERVER_REGISTRY),
+            return_exceptions=True
+        )
+        changed = []
+        with STATUS_LOCK:
+            for code, data in zip(SERVER_REGISTRY, results):
+                if isinstance(data, Exception):
+                    print(f"ERRO CRÍTICO na coleta de métricas para {code}: {data}")
+                    data = {"nome": "ERRO API", "progresso": "N/A", "saidas": "N/A", "id": None}
+                if DASHBOARD_DATA['current_status'][code] != data:
+                    DASHBOARD_DATA['current_status'][code] = data
+                    DASHBOARD_DATA['status_versions'][code] = _status_version(data)
+                    changed.append(code)
+            updated_at = datetime.datetime.now()
+            DASHBOARD_DATA['status_updated_at'] = updated_at
+
+        # Push para os navegadores conectados: cartões só quando algo mudou; o rodapé
+        # ("Última Atualização") recebe o horário de toda coleta e é atualizado no navegador
+        if changed:
+            publish_event('status', {'servers': changed})
+        publish_event('tick', {'timestamp': format_status_timestamp(updated_at)})
+
+        # Importações gravadas por outro processo (worker diário do main.py)
+        try:
+            latest_version = get_history_version()
+            if history_version is not None and latest_version != history_version:
+                publish_event('imports', {'version': latest_version})
+            history_version = latest_version
+        except Exception as e:
+            print(f"ERRO ao verificar o histórico de importações: {e}")
+
+        # Série temporal: apenas leituras frescas (erro da API e valores "stale" ficam de fora)
+        for code, data in zip(SERVER_REGISTRY, results):
+            if isinstance(data, dict) and data.get('id') is not None and not data.get('stale'):
+                record_samples(code, {"progresso": data.get('progresso'), "saidas": data.get('saidas')})
+
+        await asyncio.sleep(METRICS_COLLECTOR_INTERVAL_SECONDS)
+
+
+def start_metrics_collector():
+    """Inicia (uma vez por processo) o coletor de métricas no loop persistente da bridge."""
+    global _COLLECTOR_FUTURE
+    with _COLLECTOR_START_LOCK:
+        if _COLLECTOR_FUTURE is None or _COLLECTOR_FUTURE.done():
+            _COLLECTOR_FUTURE = submit_async_task(_collect_metrics_forever())
+
+
+def get_status_snapshot():
+    """Leitura O(1) do snapshot atual: ({servidor: métricas}, momento da coleta)."""
+    with STATUS_LOCK:
+        return dict(DASHBOARD_DATA['current_status']), DASHBOARD_DATA['status_updated_at']
+
+
+def format_status_timestamp(updated_at) -> str:
+    """Texto do rodapé do painel para o momento da última coleta."""
+    if updated_at:
+        return f"Última Atualização: {updated_at.strftime('%Y-%m-%d %H:%M:%S')}"
+    return "Última Atualização: aguardando primeira coleta..."
+
+
+def get_status_versions():
+    """Versões atuais do status por servidor (comparadas com as que o navegador já renderizou)."""
+    with STATUS_LOCK:
+        return dict(DASHBOARD_DATA['status_versions'])
+
+
+@server.before_request
+def _ensure_metrics_collector():
+    start_metrics_collector()
 
 
 
@@ -110,12 +262,13 @@ def execute_daily_import_sync(server: str, file_content_base64: str):
     """
     Função SÍNCRONA que dispara o Worker de Limpeza (Web Scraping) e Upload (API).
     ⚠️ EM PRODUÇÃO: Esta função chamará o script daily_mailing_worker.py,
-    que contém a lógica de: finalize_campaign_only() -> api_import_mailling_upload()
+    que contém a lógica de: run_finalize() -> api_import_mailling_upload()
     """
 
     # SIMULAÇÃO DA ROTINA COMPLETA:
-    old_campaign_name = DASHBOARD_DATA['current_status'][server]['nome']
-    old_campaign_progress = DASHBOARD_DATA['current_status'][server]['progresso']
+    current_status, _ = get_status_snapshot()
+    old_campaign_name = current_status[server]['nome']
+    old_campaign_progress = current_status[server]['progresso']
 
     # Chamada real ao Worker (simulada aqui)
     time.sleep(2)
@@ -124,18 +277,28 @@ def execute_daily_import_sync(server: str, file_content_base64: str):
 
     # Simula a atualização do status global (Nova Campanha no ar)
     new_campaign_name = f"CAMPANHA_{server}_{datetime.datetime.now().strftime('%H%M')}"
-    DASHBOARD_DATA['current_status'][server]['nome'] = new_campaign_name
-    DASHBOARD_DATA['current_status'][server]['progresso'] = '0%'
-    DASHBOARD_DATA['current_status'][server]['saidas'] = random.choice(['70', '80'])
-
-    # Registra o Log de Performance (Progresso Final)
-    DASHBOARD_DATA['import_log'].insert(0, {
+    with STATUS_LOCK:
+        DASHBOARD_DATA['current_status'][server] = {
+            **DASHBOARD_DATA['current_status'][server],
+            'nome': new_campaign_name,
+            'progresso': '0%',
+            'saidas': random.choice(['70', '80'])
+        }
+
+    # Registra o Log de Performance (Progresso Final) no histórico persistido
+    entry = {
         'data': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'servidor': server,
         'mailing': new_campaign_name,  # Nome da campanha que foi importada
         'status': status,
         'progresso_final': old_campaign_progress  # Progresso da campanha que SAIU
-    })
+    }
+    try:
+        entry = record_import(server, new_campaign_name, status, old_campaign_progress, origem="painel")
+    except Exception as e:
+        print(f"ERRO ao gravar o histórico de importação de {server}: {e}")
+    DASHBOARD_DATA['import_log'].appendleft(entry)
+    publish_event('imports', {'servidor': server, 'status': status})
 
     # Limpa o cache após a importação
     DASHBOARD_DATA['uploaded_content'][server] = None
@@ -149,8 +312,7 @@ def execute_daily_import_sync(server: str, file_content_base64: str):
 
 def create_info_card(title, value, server):
     """Cria um cartão de informação padronizado."""
-    is_mg = server == 'MG'
-    color = "success" if is_mg else "danger"
+    color = get_server_config(server)["color"]
 
     return dbc.Card(
         dbc.CardBody([
@@ -163,11 +325,92 @@ def create_info_card(title, value, server):
     )
 
 
+def create_upload_controls(server):
+    """Cria o bloco de upload (label, área de arraste e status) de um servidor."""
+    cfg = get_server_config(server)
+    return html.Div([
+        html.Label(f"Mailing {cfg['mailing_label']} ({server}) - Arraste e Solte", className="text-light mt-3"),
+        dcc.Upload(
+            id={'type': 'upload-data', 'server': server},
+            children=html.Div([f'Clique ou Arraste o CSV para Importação {server}']),
+            style={**UPLOAD_STYLE_DASHED, 'borderColor': BORDER_COLORS.get(cfg['color'], '#888')},
+            multiple=False
+        ),
+        html.Div(id={'type': 'upload-status', 'server': server},
+                 children=html.P(f"Aguardando CSV {server}...", className="text-muted"),
+                 style={'marginTop': '5px', 'marginBottom': '10px'}),
+    ])
+
+
+def create_import_button(server):
+    """Cria o botão de importação manual de um servidor."""
+    return dbc.Button(f"Importar {server} (Manual)", id={'type': 'btn-import', 'server': server},
+                      color=get_server_config(server)["color"], className="w-100 mb-2")
+
+
+# --- HISTÓRICO DE MÉTRICAS (GRÁFICOS) ---
+HISTORY_RANGES = {'6h': 6 * 60 * 60, '24h': 24 * 60 * 60, '7d': 7 * 24 * 60 * 60}
+HISTORY_MAX_POINTS = 300  # Pontos por série após a redução no SQLite
+
+
+def _to_datetimes(timestamps):
+    return [datetime.datetime.fromtimestamp(ts) for ts in timestamps]
+
+
+def build_history_figure(server, range_seconds):
+    """Chamadas ativas (média e pico por balde), progresso e restarts de um servidor no período."""
+    since = time.time() - range_seconds
+    calls = query_downsampled(server, "active_calls", since, max_points=HISTORY_MAX_POINTS)
+    progress = query_downsampled(server, "progresso", since, max_points=HISTORY_MAX_POINTS)
+    restarts = query_events(server, "restart", since)
+
+    figure = go.Figure()
+    figure.add_trace(go.Scatter(x=_to_datetimes(calls['ts']), y=calls['max'], name="Chamadas (pico)",
+                                mode="lines", line={'width': 1, 'dash': 'dot'}))
+    figure.add_trace(go.Scatter(x=_to_datetimes(calls['ts']), y=calls['avg'], name="Chamadas (média)",
+                                mode="lines"))
+    figure.add_trace(go.Scatter(x=_to_datetimes(progress['ts']), y=progress['avg'], name="Progresso (%)",
+                                mode="lines", yaxis="y2"))
+    if restarts:
+        figure.add_trace(go.Scatter(
+            x=_to_datetimes([ts for ts, _ in restarts]), y=[0] * len(restarts), name="Restart",
+            mode="markers", marker={'symbol': 'triangle-up', 'size': 10,
+                                    'color': ['limegreen' if ok else 'red' for _, ok in restarts]},
+        ))
+    figure.update_layout(
+        title=f"{server} - Histórico", template="plotly_dark", height=300,
+        margin={'l': 40, 'r': 40, 't': 40, 'b': 30},
+        yaxis={'title': "Chamadas ativas", 'rangemode': 'tozero'},
+        yaxis2={'title': "Progresso (%)", 'overlaying': 'y', 'side': 'right', 'range': [0, 100]},
+        legend={'orientation': 'h', 'y': -0.2},
+    )
+    return figure
+
+
+def create_history_graph(server):
+    """Gráfico de histórico de um servidor (figura preenchida pelo callback)."""
+    return dcc.Graph(id={'type': 'history-graph', 'server': server}, config={'displayModeBar': False})
+
+
+def create_status_block(server, data):
+    """Cria os cartões de status (Mailing, Progresso, Saídas) de um servidor."""
+    return [
+        dbc.Row([
+            dbc.Col(create_info_card(f"Mailing Ativo {server}", data['nome'], server), md=12),
+        ]),
+        dbc.Row([
+            dbc.Col(create_info_card(f"Progresso {server}", data['progresso'], server), md=6),
+            dbc.Col(create_info_card(f"Saídas {server}", data['saidas'], server), md=6),
+        ]),
+    ]
+
+
 app.layout = dbc.Container([
     html.H1("🚀 Agendador Discador", className="my-4 text-center text-primary"),
     html.Hr(className="bg-light"),
 
-    dcc.Interval(id='interval-component', interval=10 * 1000, n_intervals=0),
+    dcc.Interval(id='interval-component', interval=POLLING_FALLBACK_INTERVAL_SECONDS * 1000, n_intervals=0),
+    dcc.Store(id='push-signal', data=None),  # Preenchido por assets/push_updates.js a cada evento SSE
 
     dbc.Row([
 
@@ -176,39 +419,28 @@ app.layout = dbc.Container([
             html.Div(id='controls-and-status', children=[
                 html.H4("⚡ Controles de Ação", className="text-warning"),
 
-                # UPLOAD MG (MAILING EMP)
-                html.Label("Mailing EMP (MG) - Arraste e Solte", className="text-light mt-3"),
-                dcc.Upload(
-                    id='upload-data-mg',
-                    children=html.Div(['Clique ou Arraste o CSV para Importação MG']),
-                    style={**UPLOAD_STYLE_DASHED, 'borderColor': 'green'},
-                    multiple=False
-                ),
-                html.Div(id='upload-status-mg', children=html.P("Aguardando CSV MG...", className="text-muted"),
-                         style={'marginTop': '5px', 'marginBottom': '10px'}),
-
-                # UPLOAD SP (MAILING CARD)
-                html.Label("Mailing CARD (SP) - Arraste e Solte", className="text-light mt-3"),
-                dcc.Upload(
-                    id='upload-data-sp',
-                    children=html.Div(['Clique ou Arraste o CSV para Importação SP']),
-                    style={**UPLOAD_STYLE_DASHED, 'borderColor': 'red'},
-                    multiple=False
-                ),
-                html.Div(id='upload-status-sp', children=html.P("Aguardando CSV SP...", className="text-muted"),
-                         style={'marginTop': '5px', 'marginBottom': '10px'}),
+                # UPLOADS POR SERVIDOR (Gerados a partir do registro)
+                *[create_upload_controls(code) for code in SERVER_REGISTRY],
 
                 # Botão de Limpar Upload
                 dbc.Button("Limpar Uploads", id="btn-clear-upload", color="secondary", className="w-100 mb-3"),
 
                 # Botões de Importação
-                dbc.Button("Importar MG (Manual)", id="btn-import-mg", color="success", className="w-100 mb-2"),
-                dbc.Button("Importar SP (Manual)", id="btn-import-sp", color="danger", className="w-100 mb-4"),
+                *[create_import_button(code) for code in SERVER_REGISTRY],
 
                 html.Div(id='import-status-output', style={'display': 'none'}),
 
                 html.H4("✅ Status Atual do Discador", className="text-info mt-4"),
-                html.Div(id='realtime-status'),
+                html.Div(id='realtime-status', children=[
+                    html.Div([
+                        html.Hr(className="bg-secondary") if index > 0 else None,
+                        html.Div(id={'type': 'status-block', 'server': code}),
+                    ])
+                    for index, code in enumerate(SERVER_REGISTRY)
+                ]),
+                # Versões já renderizadas neste navegador (status por servidor e página do log)
+                dcc.Store(id='status-rendered-versions', data={}),
+                dcc.Store(id='log-rendered-etag', data=None),
             ]),
             width=6
         ),
@@ -217,7 +449,22 @@ app.layout = dbc.Container([
         dbc.Col(
             html.Div(id='logs-and-history', children=[
                 html.H4("📜 Histórico de Importações", className="text-info"),
+                dbc.Row([
+                    dbc.Col(dcc.Dropdown(id='log-filter-server', options=list(SERVER_REGISTRY),
+                                         placeholder="Todos os servidores", className="text-dark"), md=5),
+                    dbc.Col(dcc.DatePickerRange(id='log-filter-dates', display_format='DD/MM/YYYY',
+                                                start_date_placeholder_text="De", end_date_placeholder_text="Até",
+                                                clearable=True), md=7),
+                ], className="mb-2"),
                 html.Div(id='log-table-output'),
+                dbc.Pagination(id='log-pagination', max_value=1, active_page=1, fully_expanded=False,
+                               size="sm", className="mt-2"),
+
+                html.H4("📈 Histórico de Métricas", className="text-info mt-4"),
+                dbc.RadioItems(id='history-range', options=[{'label': key, 'value': key} for key in HISTORY_RANGES],
+                               value='24h', inline=True, className="mb-2"),
+                dcc.Interval(id='history-interval', interval=60 * 1000, n_intervals=0),
+                *[create_history_graph(code) for code in SERVER_REGISTRY],
             ]),
             width=6
         ),
@@ -236,27 +483,24 @@ app.layout = dbc.Container([
 
 # --- LÓGICA DE UPLOAD E LIMPEZA (Callbacks de Upload e Clear) ---
 
-# (Os callbacks handle_upload_mg, handle_upload_sp e handle_clear_upload foram omitidos
-# por serem longos, mas devem ser reintroduzidos aqui.)
+# (Os callbacks de upload por servidor (id {'type': 'upload-data', 'server': ...}) e handle_clear_upload
+# foram omitidos por serem longos, mas devem ser reintroduzidos aqui.)
 
 
 # --- CALLBACK DE IMPORTAÇÃO (BOTÕES) ---
 @app.callback(
     Output('import-status-output', 'children'),
-    [Input('btn-import-mg', 'n_clicks'),
-     Input('btn-import-sp', 'n_clicks')]
+    [Input({'type': 'btn-import', 'server': ALL}, 'n_clicks')]
 )
-def handle_import_buttons(n_mg, n_sp):
-    changed_id = [p['prop_id'] for p in dash.callback_context.triggered][0]
+def handle_import_buttons(n_clicks_list):
+    triggered_id = dash.callback_context.triggered_id
 
-    if changed_id == '.':
+    if not triggered_id:
         return html.Div(style={'display': 'none'})
 
     server_to_import = None
-    if 'btn-import-mg' in changed_id and n_mg > 0:
-        server_to_import = 'MG'
-    elif 'btn-import-sp' in changed_id and n_sp > 0:
-        server_to_import = 'SP'
+    if any(n_clicks_list):
+        server_to_import = triggered_id['server']
 
     if server_to_import:
         file_content = DASHBOARD_DATA['uploaded_content'][server_to_import]
@@ -282,8 +526,8 @@ def handle_import_buttons(n_mg, n_sp):
         )
 
     return html.Div(style={'display': 'none'})
-#  Detecção de Clique. O Dash descobre qual botão (btn-import-mg ou btn-import-sp) disparou o callback.
-#  Garante que a lógica use o arquivo e o IP do servidor correto (MG ou SP).
+#  Detecção de Clique. O Dash descobre qual botão ({'type': 'btn-import', 'server': ...}) disparou o callback.
+#  Garante que a lógica use o arquivo e o IP do servidor correto (registro de servidores).
 
 
 
@@ -291,69 +535,122 @@ def handle_import_buttons(n_mg, n_sp):
 
 # --- CALLBACK DE ATUALIZAÇÃO DE STATUS EM TEMPO REAL ---
 @app.callback(
-    [Output('realtime-status', 'children'),
+    [Output({'type': 'status-block', 'server': ALL}, 'children'),
+     Output('status-rendered-versions', 'data'),
      Output('footer-timestamp', 'children')],
-    [Input('interval-component', 'n_intervals')]
-    #Gatilho Automático. É o cronômetro que força a função a ser executada a cada 10 segundos.
-    # Permite a monitoração contínua.
+    [Input('interval-component', 'n_intervals'),
+     Input('push-signal', 'data')],
+    # Gatilhos: o push do coletor (SSE) assim que o status muda e o Interval de fallback.
+    # Entre eles, o rodapé é atualizado direto no navegador pelo evento 'tick' (assets/push_updates.js).
+    [State('status-rendered-versions', 'data')]
 )
-def update_realtime_status(n):
-    # 1. Busca os dados dos Workers (em um thread separado)
-    mg_data = executor.submit(get_active_campaign_metrics_sync, 'MG').result()
-    #Coleta de Métricas. Chama a função get_active_campaign_metrics_sync
-    # (que contém o código validado de API Call 1 e 2) em um thread.
-    # Busca os dados reais de Nome da Campanha, Progresso e Saídas Ativas diretamente do servidor de discagem.
-    sp_data = executor.submit(get_active_campaign_metrics_sync, 'SP').result()
-
-    # 2. Cria os cartões de status
-    cards = [
-        dbc.Row([
-            dbc.Col(create_info_card("Mailing Ativo MG", mg_data['nome'], 'MG'), md=12),
-        ]),
-        dbc.Row([
-            dbc.Col(create_info_card("Progresso MG", mg_data['progresso'], 'MG'), md=6),
-            dbc.Col(create_info_card("Saídas MG", mg_data['saidas'], 'MG'), md=6),
-        ]),
-        html.Hr(className="bg-secondary"),
-        dbc.Row([
-            dbc.Col(create_info_card("Mailing Ativo SP", sp_data['nome'], 'SP'), md=12),
-        ]),
-        dbc.Row([
-            dbc.Col(create_info_card("Progresso SP", sp_data['progresso'], 'SP'), md=6),
-            dbc.Col(create_info_card("Saídas SP", sp_data['saidas'], 'SP'), md=6),
-        ])
-    ]
+def update_realtime_status(n, push_signal, rendered_versions):
+    # 1. Compara as versões do coletor com as que este navegador já tem (nenhuma chamada de rede)
+    versions = get_status_versions()
+    current_status, updated_at = get_status_snapshot()
+    rendered = rendered_versions or {}
 
-    timestamp = f"Última Atualização: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    return cards, timestamp
+    timestamp = format_status_timestamp(updated_at)
 
+    # 2. Recria apenas os cartões dos servidores cujo status mudou
+    changed = [code for code in SERVER_REGISTRY if rendered.get('servers', {}).get(code) != versions[code]]
+    timestamp_changed = rendered.get('timestamp') != timestamp
+    if not changed and not timestamp_changed:
+        return [no_update] * len(SERVER_REGISTRY), no_update, no_update
 
-# --- CALLBACK DE ATUALIZAÇÃO DA TABELA DE LOG (COM CORREÇÃO DE CRASH) ---
+    blocks = [create_status_block(code, current_status[code]) if code in changed else no_update
+              for code in SERVER_REGISTRY]
+    return blocks, {'servers': versions, 'timestamp': timestamp}, timestamp if timestamp_changed else no_update
+
+
+# --- CALLBACK DOS GRÁFICOS DE HISTÓRICO (REDUÇÃO NO SERVIDOR) ---
 @app.callback(
-    Output('log-table-output', 'children'),
-    [Input('interval-component', 'n_intervals'),
-     Input('import-status-output', 'children')]
+    Output({'type': 'history-graph', 'server': ALL}, 'figure'),
+    [Input('history-interval', 'n_intervals'),
+     Input('history-range', 'value')]
 )
-def update_log_table(n_intervals, import_output):
-    if not DASHBOARD_DATA['import_log']:
-        return dbc.Alert("Nenhum registro de importação encontrado.", color="info")
+def update_history_graphs(n_intervals, range_key):
+    range_seconds = HISTORY_RANGES.get(range_key, HISTORY_RANGES['24h'])
+    return [build_history_figure(code, range_seconds) for code in SERVER_REGISTRY]
+
 
-    df = pd.DataFrame(DASHBOARD_DATA['import_log'])
+# --- CALLBACK DE ATUALIZAÇÃO DA TABELA DE LOG (PAGINADA NO SQLITE) ---
+# A página renderizada fica em cache até o histórico mudar (id do último registro), e o
+# navegador guarda a chave (etag) do que já mostra: sem mudança, cada disparo (push ou
+# Interval de fallback) custa uma consulta pela chave primária e responde no_update.
+_LOG_TABLE_CACHE = {'key': None, 'value': None}
+
+
+def render_import_log_table(entries):
+    df = pd.DataFrame(entries, columns=['data', 'servidor', 'mailing', 'status', 'progresso_final'])
 
     # Renomeia colunas para exibição amigável
     df.columns = ['Data/Hora', 'Servidor', 'Mailing', 'Status', 'Progresso Antigo']
 
     # Formatação de estilo do Dash Table
-    table = dbc.Table.from_dataframe(
+    return dbc.Table.from_dataframe(
         df,
         striped=True,
         bordered=True,
         hover=True,
-        dark=True,
+        color="dark",
         className="table-sm"
     )
 
-    return table
+
+@app.callback(
+    [Output('log-table-output', 'children'),
+     Output('log-pagination', 'max_value'),
+     Output('log-rendered-etag', 'data')],
+    [Input('interval-component', 'n_intervals'),
+     Input('push-signal', 'data'),
+     Input('import-status-output', 'children'),
+     Input('log-filter-server', 'value'),
+     Input('log-filter-dates', 'start_date'),
+     Input('log-filter-dates', 'end_date'),
+     Input('log-pagination', 'active_page')],
+    [State('log-rendered-etag', 'data')]
+)
+def update_log_table(n_intervals, push_signal, import_output, server_filter, date_from, date_to, active_page, rendered_etag):
+    page = active_page or 1
+    try:
+        key = [get_history_version(), server_filter, date_from, date_to, page]
+        if key == rendered_etag:
+            # Este navegador já mostra exatamente esta página: nada a enviar
+            return no_update, no_update, no_update
+        if key == _LOG_TABLE_CACHE['key']:
+            return (*_LOG_TABLE_CACHE['value'], key)
+
+        entries, total = query_imports(server_filter, date_from, date_to, page=page,
+                                       page_size=IMPORT_LOG_PAGE_SIZE)
+    except Exception as e:
+        print(f"ERRO ao consultar o histórico de importações: {e}")
+        entries = list(DASHBOARD_DATA['import_log'])[:IMPORT_LOG_PAGE_SIZE]
+        total, key = len(entries), None
+
+    max_page = max(1, -(-total // IMPORT_LOG_PAGE_SIZE))
+    if not entries:
+        value = (dbc.Alert("Nenhum registro de importação encontrado.", color="info"), max_page)
+    else:
+        value = (render_import_log_table(entries), max_page)
+
+    _LOG_TABLE_CACHE.update(key=key, value=value)
+    return (*value, key)
+
+
+# --- CANAL DE PUSH (SERVER-SENT EVENTS) ---
+@server.route('/events')
+def stream_events():
+    """Stream SSE com os eventos do coletor ('status') e do histórico ('imports')."""
+    if not has_capacity():
+        # Lotado: o navegador tenta de novo mais tarde e segue no Interval de fallback
+        return flask.Response("Limite de conexões de push atingido.", status=503,
+                              headers={'Retry-After': '60'})
+    return flask.Response(
+        iter_event_stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 
 # ------------------------------------------------------------------
@@ -0,0 +1,48 @@
+// assets/push_updates.js (Push do servidor via SSE -> acorda os callbacks do painel)
+//
+// O Dash carrega automaticamente os arquivos de /assets. Cada evento recebido em /events
+// grava um sinal no dcc.Store "push-signal"; os callbacks de status e de log dependem
+// dele e respondem no_update quando nada mudou para este navegador. O evento 'tick' (toda
+// coleta) só troca o texto do rodapé, sem ida ao servidor.
+(function () {
+    if (!window.EventSource) {
+        return;  // Sem SSE: o dcc.Interval de fallback continua atualizando o painel
+    }
+
+    var PUSH_EVENTS = ['status', 'imports'];
+    var RECONNECT_AFTER_REFUSAL_MS = 60000;  // /events lotado (503): tenta de novo depois
+
+    function connect() {
+        // Reconecta sozinho após quedas e quando o servidor encerra a conexão pelo prazo
+        var source = new EventSource('/events');
+
+        PUSH_EVENTS.forEach(function (eventName) {
+            source.addEventListener(eventName, function (event) {
+                if (!window.dash_clientside || !window.dash_clientside.set_props) {
+                    return;  // Renderer do Dash ainda carregando
+                }
+                window.dash_clientside.set_props('push-signal', {
+                    data: {event: eventName, payload: JSON.parse(event.data), received_at: Date.now()}
+                });
+            });
+        });
+
+        source.addEventListener('tick', function (event) {
+            if (!window.dash_clientside || !window.dash_clientside.set_props) {
+                return;
+            }
+            window.dash_clientside.set_props('footer-timestamp', {
+                children: JSON.parse(event.data).timestamp
+            });
+        });
+
+        source.onerror = function () {
+            // Resposta de erro (ex.: limite de conexões) fecha o EventSource de vez
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(connect, RECONNECT_AFTER_REFUSAL_MS);
+            }
+        };
+    }
+
+    connect();
+})();
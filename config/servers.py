@@ -0,0 +1,113 @@
+# config/servers.py (Registro Único dos Servidores do Discador)
+
+import os
+import json
+from config.settings import SAIDAS_VALOR
+
+# --- ORIGEM DO REGISTRO ---
+# Ordem de prioridade: SERVERS_CONFIG_JSON (JSON inline no Railway Secrets)
+# -> SERVERS_CONFIG_FILE -> config/servers.json
+SERVERS_CONFIG_FILE = os.getenv("SERVERS_CONFIG_FILE",
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), "servers.json"))
+
+# --- SOBREPOSIÇÃO POR VARIÁVEL DE AMBIENTE (sem editar o JSON) ---
+# SERVER_<CODE>_BASE_URL, SERVER_<CODE>_LOGIN_URL, SERVER_<CODE>_FILA, SERVER_<CODE>_SAIDAS
+# (ex: SERVER_MG_SAIDAS=50). BASE_URL_<CODE> e FILA_NOME_<CODE> também são aceitos.
+# Prioridade: SERVER_<CODE>_* -> nome alternativo -> registro -> padrão.
+
+# Valores aplicados quando o servidor não define o campo
+DEFAULT_SAIDAS = SAIDAS_VALOR
+DEFAULT_LIMITS = {
+    "http_max_connections": 10,
+    "upload_concurrency": 2,
+}
+
+# Como cada operação de campanha é feita (scripts/campaign_engine.py): "api" ou "ui"
+DEFAULT_CAPABILITIES = {
+    "status": "api",
+    "finalize": "ui",
+    "start": "ui",
+}
+CAPABILITY_MODES = ("api", "ui")
+# Operações com endpoint conhecido na API do discador (finalizar/subir só existem na UI)
+API_CAPABLE_OPERATIONS = ("status",)
+
+_REGISTRY: dict[str, dict] | None = None
+
+
+def _env_override(code: str, field: str, legacy_name: str | None = None) -> str | None:
+    """Valor de SERVER_<CODE>_<CAMPO> (ou da variável antiga equivalente), se definido."""
+    return os.getenv(f"SERVER_{code}_{field}") or (os.getenv(legacy_name) if legacy_name else None)
+
+
+def _normalize_server(entry: dict) -> dict:
+    """Valida e completa a entrada de um servidor com os valores padrão e as sobreposições do ambiente."""
+    code = entry["code"].upper()
+    env_base_url = _env_override(code, "BASE_URL", f"BASE_URL_{code}")
+    base_url = (env_base_url or entry["base_url"]).rstrip('/')
+    # Login do JSON só vale para o host do JSON: com BASE_URL sobreposta, deriva do novo host
+    login_url = (_env_override(code, "LOGIN_URL")
+                 or (None if env_base_url else entry.get("login_url"))
+                 or f"{base_url}/azcall/pages/login.php")
+    capabilities = {**DEFAULT_CAPABILITIES, **entry.get("capabilities", {})}
+    for operation, mode in capabilities.items():
+        if operation not in DEFAULT_CAPABILITIES:
+            raise ValueError(f"Servidor '{code}': operação '{operation}' desconhecida em 'capabilities'.")
+        if mode not in CAPABILITY_MODES:
+            raise ValueError(f"Servidor '{code}': capacidade '{operation}' inválida ('{mode}'). Use 'api' ou 'ui'.")
+        if mode == "api" and operation not in API_CAPABLE_OPERATIONS:
+            raise ValueError(f"Servidor '{code}': '{operation}' não tem endpoint na API do discador. Use 'ui'.")
+    return {
+        **entry,
+        "code": code,
+        "base_url": base_url,
+        "login_url": login_url,
+        "fila": _env_override(code, "FILA", f"FILA_NOME_{code}") or entry.get("fila") or f"DISCADOR_{code}",
+        "mailing_prefix": entry.get("mailing_prefix"),
+        "mailing_label": entry.get("mailing_label") or code,
+        "saidas": str(_env_override(code, "SAIDAS") or entry.get("saidas") or DEFAULT_SAIDAS),
+        "monitor": entry.get("monitor", True),
+        "daily_import": entry.get("daily_import", bool(entry.get("mailing_prefix"))),
+        "color": entry.get("color", "info"),
+        "limits": {**DEFAULT_LIMITS, **entry.get("limits", {})},
+        "capabilities": capabilities,
+    }
+
+
+def load_server_registry(force_reload: bool = False) -> dict[str, dict]:
+    """Carrega (uma única vez) o registro de servidores indexado pelo código (MG, SP, ...)."""
+    global _REGISTRY
+    if _REGISTRY is not None and not force_reload:
+        return _REGISTRY
+
+    inline_config = os.getenv("SERVERS_CONFIG_JSON")
+    if inline_config:
+        raw_config = json.loads(inline_config)
+    else:
+        with open(SERVERS_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            raw_config = json.load(f)
+
+    # dict preserva a ordem do arquivo (usada no dashboard e no scheduler)
+    _REGISTRY = {}
+    for entry in raw_config["servers"]:
+        server = _normalize_server(entry)
+        _REGISTRY[server["code"]] = server
+    return _REGISTRY
+
+
+def get_server_config(server: str) -> dict:
+    """Lookup O(1) da configuração de um servidor."""
+    try:
+        return load_server_registry()[server.upper()]
+    except KeyError:
+        raise ValueError(f"Servidor '{server}' não está cadastrado no registro de servidores.")
+
+
+def get_monitored_servers() -> list[str]:
+    """Servidores com monitoramento de active calls habilitado."""
+    return [code for code, cfg in load_server_registry().items() if cfg["monitor"]]
+
+
+def get_daily_import_servers() -> list[str]:
+    """Servidores que participam do pipeline diário de importação."""
+    return [code for code, cfg in load_server_registry().items() if cfg["daily_import"]]
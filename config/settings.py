@@ -1,20 +1,14 @@
 # config/settings.py (VERSÃO FINAL DE DEPLOY COERENTE)
 
-# --- URLs de Acesso ao SISTEMA (Para Login/Web Scraping) ---
-# Necessárias para o monitor.py e restart_campaign.py.
-LOGIN_URL_MG = "http://186.194.50.155/azcall/pages/login.php"
-LOGIN_URL_SP = "https://186.194.50.149/azcall/pages/login.php"
+import os
 
-# --- URLs Base da API (Usadas para construir o endpoint /api/) ---
-# O Postman e testes provaram que a API está acessível na raiz do IP.
-BASE_URL_MG = "http://186.194.50.155"
-BASE_URL_SP = "https://186.194.50.149"
+# --- SERVIDORES DO DISCADOR ---
+# URLs (login/API), filas, prefixos de mailing e limites de cada servidor ficam
+# no registro único: config/servers.json (lido por config/servers.py).
 
 
 # --- CONFIGURAÇÕES DO NEGÓCIO ---
-FILA_NOME_MG = "DISCADOR_MG"
-FILA_NOME_SP = "DISCADOR_SP"
-SAIDAS_VALOR = "70" # Valor de canais para o upload diário
+SAIDAS_VALOR = "70" # Valor padrão de canais (quando o servidor não define "saidas")
 
 
 
@@ -24,3 +18,41 @@ API_TOKEN_NAME = "API_TOKEN" # Chave lida do Railway Secrets/Local .env
 
 # --- CAMINHOS DE MAILING LOCAIS (TESTE) ---
 LOCAL_MAILING_BASE_DIR = r"D:\Ferramentas\5. Verificação Final\MAILING DISCADOR"
+
+
+# --- MONITORAMENTO ---
+# "http": lê o ch.php direto com o cookie da sessão (fallback automático para o Playwright)
+# "playwright": sempre usa o navegador do pool
+MONITOR_BACKEND = os.getenv("MONITOR_BACKEND", "http").lower()
+
+
+# --- POOL HTTP (API do discador e monitor HTTP) ---
+# O limite de conexões por servidor fica no registro (limits.http_max_connections)
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "20"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "5"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+UPLOAD_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_TIMEOUT_SECONDS", "120"))
+
+
+# --- CACHE DE MÉTRICAS DO DASHBOARD (get_active_campaign_metrics) ---
+METRICS_CACHE_TTL_SECONDS = float(os.getenv("METRICS_CACHE_TTL_SECONDS", "5"))
+METRICS_STALE_MAX_AGE_SECONDS = float(os.getenv("METRICS_STALE_MAX_AGE_SECONDS", "300"))  # Tempo máximo servindo dado antigo em erro
+
+
+# --- AUTOMAÇÃO DE UI (restart/finalização via Playwright) ---
+# Esperas por condição (rede ociosa, opção visível, modal fechado) em vez de pausas fixas
+RESTART_LATENCY_BUDGET_SECONDS = float(os.getenv("RESTART_LATENCY_BUDGET_SECONDS", "10"))
+UI_NETWORK_IDLE_TIMEOUT_MS = int(os.getenv("UI_NETWORK_IDLE_TIMEOUT_MS", "5000"))  # Teto da espera por rede ociosa
+UI_ACTION_RESPONSE_TIMEOUT_MS = int(os.getenv("UI_ACTION_RESPONSE_TIMEOUT_MS", "20000"))  # Resposta do POST de Finalizar/Subir
+# Endpoint (final do caminho, ex: "finaliza_campanha.php") do POST de cada ação. Vazio: usa o
+# action do formulário do botão ou, sem formulário, o caminho da própria tela Enviar
+UI_FINALIZE_POST_PATH = os.getenv("UI_FINALIZE_POST_PATH", "")
+UI_START_POST_PATH = os.getenv("UI_START_POST_PATH", "")
+
+
+# --- PERSISTÊNCIA LOCAL (Sessões, Índices e Históricos) ---
+# No Railway, aponte DATA_DIR para um Volume para sobreviver a redeploys.
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".data"))
+SESSION_STATE_DIR = os.path.join(DATA_DIR, "sessions")
+SESSION_STATE_TTL_SECONDS = int(os.getenv("SESSION_STATE_TTL_SECONDS", str(8 * 60 * 60)))  # 8h
@@ -3,15 +3,30 @@
 import asyncio
 import time
 import datetime  # Importado para a lógica de horário e dias
+from functools import partial
 from scripts.monitor import run_monitor
-from scripts.restart_campaign import restart_campaign
+from scripts.restart_campaign import prestage_restart
+from scripts.campaign_engine import run_restart
 from scripts.daily_mailing_worker import run_daily_import_pipeline
-
-# Lista dos servidores que devem ser monitorados em cada ciclo
-SERVERS_TO_MONITOR = ["MG", "SP"]
-
-# Intervalo de Checagem (30 segundos)
-CHECK_INTERVAL_SECONDS = 15  # Usando 15s para performance
+from utils.login_manager import close_browser_pool
+from utils.http_pool import close_http_clients
+from utils.metrics_store import record_samples, flush_samples, parse_metric_value
+from utils.mailing_api import get_active_campaign_metrics
+from utils.adaptive_polling import (
+    record_poll_observation, next_poll_interval, should_prestage_restart, mark_restart, restart_grace_remaining
+)
+from utils.scheduler import JobScheduler, IntervalJob, DailyJob
+from config.servers import get_monitored_servers, get_daily_import_servers
+
+# Lista dos servidores que devem ser monitorados em cada ciclo (registro config/servers.json)
+SERVERS_TO_MONITOR = get_monitored_servers()
+
+# Intervalo de Checagem: adaptativo por servidor (utils/adaptive_polling.py), entre
+# MONITOR_MIN_INTERVAL_SECONDS e MONITOR_MAX_INTERVAL_SECONDS, partindo de 15s
+
+# --- CONCORRÊNCIA DO CICLO (Checagens em paralelo entre servidores) ---
+MAX_CONCURRENT_CHECKS = 2  # Limite de checagens simultâneas (evita N navegadores no container)
+SERVER_CHECK_TIMEOUT_SECONDS = 180  # Teto por servidor (monitor + eventual restart)
 
 # --- CONSTANTES DE HORÁRIO DE EXPEDIENTE (PARA MONITORAMENTO) ---
 START_HOUR = 9  # 09:00h
@@ -23,17 +38,19 @@ END_MINUTE = 30  # 18:30h
 # --- CONSTANTES DE EXECUÇÃO DO PIPELINE DE IMPORTAÇÃO (11:00h) ---
 DAILY_IMPORT_HOUR = 11
 DAILY_IMPORT_MINUTE = 00
+DAILY_IMPORT_WEEKDAYS = range(5)  # Segunda a Sexta
+DAILY_IMPORT_CATCHUP_SECONDS = 4 * 60 * 60  # Execução perdida roda até 15:00h (ex: container reiniciado)
 
 
 # --------------------------------------------
 
 
-def is_within_operating_hours() -> bool:
+def is_within_operating_hours(now: datetime.datetime | None = None) -> bool:
     """
     Verifica se o horário e dia atual estão dentro da janela de operação
     (Segunda a Sexta, 09:30h às 18:30h).
     """
-    now = datetime.datetime.now()
+    now = now or datetime.datetime.now()
 
     # Checagem 1: Dia da Semana (Segunda=0, Domingo=6)
     if now.weekday() >= 5:
@@ -50,70 +67,140 @@ def is_within_operating_hours() -> bool:
     return False
 
 
+def next_operating_window(moment: datetime.datetime) -> datetime.datetime:
+    """
+    Janela do monitoramento para o agendador: o próprio momento se estiver no expediente,
+    senão a próxima abertura (09:30h do próximo dia útil).
+    """
+    if is_within_operating_hours(moment):
+        return moment
+
+    day = moment.date()
+    if moment.time() >= datetime.time(START_HOUR, START_MINUTE):
+        day += datetime.timedelta(days=1)
+    while day.weekday() >= 5:
+        day += datetime.timedelta(days=1)
+    return datetime.datetime.combine(day, datetime.time(START_HOUR, START_MINUTE))
+
+
 async def check_and_act(server: str):
     """
     Executa o monitoramento e acionamento (restart) para um servidor específico.
     """
     # 1. Executa o Monitoramento (Passa o parâmetro 'server' para o worker)
-    result = await run_monitor(server=server)
+    # junto com as métricas da campanha (progresso) via API, usadas no intervalo adaptativo
+    result, campaign_metrics = await asyncio.gather(
+        run_monitor(server=server), get_active_campaign_metrics(server)
+    )
     active_calls = result.get("active_calls", -1)
     status = result.get("status", "ERRO")
 
     print(f"[{server}] Resultado: {active_calls} active calls. Status: {status}")
+    record_poll_observation(server, active_calls if status == "OK" else -1,
+                            parse_metric_value(campaign_metrics.get("progresso")))
+
+    # Série temporal: só leituras válidas (o histórico mostra o tempo morto entre zerar e o restart)
+    if status == "OK" and active_calls >= 0:
+        record_samples(server, {"active_calls": active_calls})
 
     # 2. Lógica Condicional: Acionar Restart se Active Calls == 0
     if active_calls == 0 and status == "OK":
+        grace = restart_grace_remaining(server)
+        if grace > 0:
+            print(f"[{server}] ⏳ Chamadas zeradas logo após o restart: aguardando a campanha nova discar "
+                  f"({grace:.0f}s de carência).")
+            return
+
         print(f"🚨 ALERTA [{server}]: Chamadas zeradas. Acionando ROTINA DE RESTART...")
 
         # 3. Aciona o Restarter (Passa o parâmetro 'server' para o worker)
-        success = await restart_campaign(server=server)
+        success = await run_restart(server=server)
+        record_samples(server, {"restart": 1 if success else 0})
 
         if success:
+            mark_restart(server)
             print(f"✅ RESTART SUCESSO [{server}]: Campanha reimportada e subida.")
         else:
             print(f"❌ RESTART FALHA [{server}]: Falha na rotina de reimportação.")
 
     elif active_calls > 0:
         print(f"[{server}] Operação normal. Chamadas ativas: {active_calls}")
+
+        # Modo preditivo: campanha perto de zerar -> deixa o restart pronto (sessão + tela Enviar)
+        if should_prestage_restart(server):
+            await prestage_restart(server=server)
     else:
         print(f"[{server}] FALHA CRÍTICA no Monitoramento. Status: {status}")
 
 
+_CHECK_SEMAPHORE: asyncio.Semaphore | None = None
+
+
+async def _isolated_check(server: str):
+    """
+    Executa check_and_act com limite de concorrência, timeout próprio e isolamento de falhas:
+    um erro ou travamento em um servidor nunca segura os demais.
+    """
+    global _CHECK_SEMAPHORE
+    if _CHECK_SEMAPHORE is None:
+        _CHECK_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_CHECKS)
+
+    async with _CHECK_SEMAPHORE:
+        try:
+            await asyncio.wait_for(check_and_act(server=server), timeout=SERVER_CHECK_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"[{server}] ⏱️ TIMEOUT: Checagem excedeu {SERVER_CHECK_TIMEOUT_SECONDS}s. Seguindo com os demais.")
+        except Exception as e:
+            print(f"[{server}] FALHA CRÍTICA inesperada na checagem: {e}")
+
+
+async def run_server_check(server: str):
+    """Checagem de um servidor (job próprio no scheduler, com intervalo adaptativo)."""
+    print(f"\n--- [ATIVO] Checagem {server} Iniciada ({datetime.datetime.now().strftime('%H:%M:%S')}) ---")
+    await _isolated_check(server)
+    print(f"--- [{server}] Fim da Checagem. Próxima em {next_poll_interval(server):.0f} segundos. ---")
+
+
+async def run_daily_imports():
+    """Pipeline de importação diária (11:00h): Excluir/Importar Mailing Novo em cada servidor do registro."""
+    print("\n--- INICIANDO PIPELINE DE IMPORTAÇÃO DIÁRIA (11:00h) ---")
+    # Execução sequencial entre servidores
+    for server in get_daily_import_servers():
+        await run_daily_import_pipeline(server=server)
+
+
+def build_jobs() -> list:
+    """Jobs do scheduler: importação diária (exclusiva) e um job de monitoramento por servidor no expediente."""
+    return [
+        # Exclusivo: o monitoramento não roda (nem aciona restart) durante a troca de mailing
+        DailyJob("importacao_diaria", run_daily_imports,
+                 hour=DAILY_IMPORT_HOUR, minute=DAILY_IMPORT_MINUTE, weekdays=DAILY_IMPORT_WEEKDAYS,
+                 catch_up_seconds=DAILY_IMPORT_CATCHUP_SECONDS, exclusive=True),
+        *(IntervalJob(f"monitoramento_{server}", partial(run_server_check, server),
+                      interval_seconds=partial(next_poll_interval, server), window=next_operating_window)
+          for server in SERVERS_TO_MONITOR),
+    ]
+
+
 async def main_scheduler():
     """
     Loop principal que executa o monitoramento e a checagem da rotina diária.
     """
     print("Iniciando Scheduler Principal (Modo Headless Railway)...")
 
-    while True:
-        now = datetime.datetime.now()
-
-        # 1. Checagem da Rotina Diária (Horário Fixo: 11:00h)
-        if now.hour == DAILY_IMPORT_HOUR and now.minute == DAILY_IMPORT_MINUTE and now.weekday() < 5:
-            print("\n--- INICIANDO PIPELINE DE IMPORTAÇÃO DIÁRIA (11:00h) ---")
-
-            # Execução sequencial: Excluir/Importar Mailing Novo em MG e SP
-            await run_daily_import_pipeline(server="MG")
-            await run_daily_import_pipeline(server="SP")
-
-            # ✅ PAUSA DE SEGURANÇA: CRUCIAL para evitar a execução duplicada no mesmo minuto
-            await asyncio.sleep(60)
-
-            # 2. Rotina de Monitoramento Contínuo (09:30h - 18:30h)
-        if is_within_operating_hours():
-            print(f"\n--- [ATIVO] Ciclo de Monitoramento Iniciado ({now.strftime('%H:%M:%S')}) ---")
-
-            # Executa as checagens de forma sequencial para MG e SP
-            await check_and_act(server="MG")
-            await check_and_act(server="SP")
-
-        else:
-            # A checagem de horário é FALSE, apenas loga o status inativo
-            print(
-                f"--- [INATIVO] Fora do Horário Comercial ({now.strftime('%H:%M:%S')}). Próxima checagem em {CHECK_INTERVAL_SECONDS} segundos. ---")
-
-        print(f"--- Fim do Ciclo. Aguardando {CHECK_INTERVAL_SECONDS} segundos. ---")
-        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+    try:
+        await _scheduler_loop()
+    finally:
+        # Libera o Chromium persistente do pool e os clientes HTTP ao encerrar o processo
+        flush_samples()
+        await close_http_clients()
+        await close_browser_pool()
+
+
+async def _scheduler_loop():
+    # Heap de timers: dorme até o próximo job (fora do expediente, até a próxima abertura),
+    # sem checar o relógio a cada 15s. Últimas execuções ficam em DATA_DIR/scheduler_state.json.
+    await JobScheduler(build_jobs()).run_forever()
 
 
 if __name__ == '__main__':
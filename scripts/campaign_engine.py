@@ -0,0 +1,123 @@
+# scripts/campaign_engine.py (Restart/Finalização: API primeiro, UI como fallback)
+
+import os
+import time
+import asyncio
+from scripts.restart_campaign import restart_campaign, finalize_campaign_only
+from utils.mailing_api import api_list_campaigns
+from config.servers import get_server_config
+
+# Cada servidor declara no registro (config/servers.json -> "capabilities") como cada
+# operação é feita: "api" (HTTP, sem navegador) ou "ui" (Playwright, scripts/restart_campaign.py).
+#   status   -> campanha ativa (list_campaign.php): pré-checagem e verificação pós-ação
+#   finalize -> finalizar a campanha atual
+#   start    -> subir a campanha (campanha + telefone + fila + saídas)
+# O registro valida as capacidades na carga: finalizar e subir ainda não têm endpoint
+# conhecido na API do discador, então hoje só "status" aceita "api".
+
+# Verificação via API após a ação na UI (a listagem pode demorar alguns segundos para refletir)
+CAMPAIGN_VERIFY_TIMEOUT_SECONDS = float(os.getenv("CAMPAIGN_VERIFY_TIMEOUT_SECONDS", "30"))
+CAMPAIGN_VERIFY_POLL_SECONDS = float(os.getenv("CAMPAIGN_VERIFY_POLL_SECONDS", "2"))
+
+
+def uses_api(server: str, operation: str) -> bool:
+    return get_server_config(server)["capabilities"][operation] == "api"
+
+
+async def _get_active_campaign(server: str) -> dict | None:
+    """Campanha ativa segundo list_campaign.php (sem cache), ou None se não há nenhuma."""
+    campaigns = await api_list_campaigns(server)
+    if not campaigns or not campaigns[0].get('id'):
+        return None
+    return campaigns[0]
+
+
+async def _wait_for_campaign_state(server: str, condition) -> bool:
+    """Consulta a API até condition(campanha_ativa) ser verdadeira ou o prazo de verificação vencer."""
+    deadline = time.monotonic() + CAMPAIGN_VERIFY_TIMEOUT_SECONDS
+    while True:
+        if condition(await _get_active_campaign(server)):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(CAMPAIGN_VERIFY_POLL_SECONDS)
+
+
+async def run_restart(server: str) -> bool:
+    """
+    Restart da campanha: lê a campanha ativa via API, finaliza + sobe pela UI e confirma
+    via API que uma campanha nova (outro id) está ativa. O resultado é o da UI: a campanha
+    antiga já foi finalizada, então a falta de confirmação só gera um aviso (e o período de
+    carência pós-restart continua valendo).
+    """
+    server_name = server.upper()
+    status_via_api = uses_api(server, "status")
+    previous = None
+
+    if status_via_api:
+        try:
+            previous = await _get_active_campaign(server)
+        except Exception as e:
+            print(f"[{server_name}] ⚠️ API de status indisponível ({e}). Seguindo só pela UI.")
+            status_via_api = False
+        else:
+            if previous is None:
+                # Campanha drenada pode sumir da listagem: é justamente quando o restart é necessário
+                print(f"[{server_name}] ⚠️ API não lista campanha ativa. Restart segue pela UI.")
+
+    # Finalizar e subir acontecem na mesma tela: uma única passada pela UI
+    success = await restart_campaign(server=server)
+    if not success or not status_via_api:
+        return success
+
+    previous_id = previous.get('id') if previous else None
+    try:
+        if await _wait_for_campaign_state(
+                server, lambda campaign: campaign is not None and campaign.get('id') != previous_id):
+            print(f"[{server_name}] ✅ API confirmou a nova campanha ativa após o restart.")
+            return True
+        print(f"[{server_name}] ⚠️ API não mostra campanha nova {CAMPAIGN_VERIFY_TIMEOUT_SECONDS:.0f}s "
+              f"após o restart. Mantendo o resultado da UI.")
+        return success
+    except Exception as e:
+        print(f"[{server_name}] ⚠️ Verificação via API falhou ({e}). Mantendo o resultado da UI.")
+        return success
+
+
+async def run_finalize(server: str) -> bool:
+    """
+    Finalização da campanha atual: se a API mostra que não há campanha ativa, não abre o
+    navegador; senão finaliza pela UI e confirma via API que a campanha saiu da lista.
+    O resultado é o da UI: sem confirmação da API só há aviso, e a importação segue.
+    """
+    server_name = server.upper()
+    status_via_api = uses_api(server, "status")
+    previous = None
+
+    if status_via_api:
+        try:
+            previous = await _get_active_campaign(server)
+        except Exception as e:
+            print(f"[{server_name}] ⚠️ API de status indisponível ({e}). Seguindo só pela UI.")
+            status_via_api = False
+        else:
+            if previous is None:
+                print(f"[{server_name}] ✅ API: nenhuma campanha ativa. Nada a finalizar.")
+                return True
+
+    success = await finalize_campaign_only(server)
+    if not success or not status_via_api:
+        return success
+
+    try:
+        finalized = await _wait_for_campaign_state(
+            server, lambda campaign: campaign is None or campaign.get('id') != previous.get('id'))
+        if finalized:
+            print(f"[{server_name}] ✅ API confirmou a finalização da campanha {previous.get('id')}.")
+            return True
+        print(f"[{server_name}] ⚠️ Campanha {previous.get('id')} continua listada na API após a finalização. "
+              f"Mantendo o resultado da UI.")
+        return success
+    except Exception as e:
+        print(f"[{server_name}] ⚠️ Verificação via API falhou ({e}). Mantendo o resultado da UI.")
+        return success
@@ -7,22 +7,31 @@ import pandas as pd
 import httpx  # Necessário para a API
 
 # --- IMPORTAÇÕES DE FUNÇÕES DO PROJETO ---
-from scripts.restart_campaign import finalize_campaign_only
-from utils.mailing_api import api_import_mailling_upload
+from scripts.campaign_engine import run_finalize
+from utils.mailing_api import prepare_mailling_import, send_prepared_import, release_prepared_import
 from config.settings import LOCAL_MAILING_BASE_DIR  # Caminho local
+from config.servers import get_server_config
+from utils.import_history import record_import
 
 # Assumimos que as constantes estão no escopo global ou importadas.
 # ----------------------------------------
 
 # --- VARIÁVEIS DE CONTROLE ---
-MAILING_FILE_MAP = {"MG": "MAILING_DISCADOR_EMP", "SP": "MAILING_DISCADOR_CARD"}
 TEST_IMPORT_ID = "1"
 TEST_LOGIN_CRM = "DAILY_IMPORTER"
 
 
+def _record_history(server: str, mailing: str, status: str):
+    """Registra o resultado no histórico de importações exibido no painel (nunca derruba o pipeline)."""
+    try:
+        record_import(server, mailing, status, origem="diario")
+    except Exception as e:
+        print(f"[{server.upper()}] ⚠️ Falha ao gravar o histórico de importação: {e}")
+
+
 async def run_daily_import_pipeline(server: str):
     """
-    Executa a rotina diária de substituição de mailing: Finalizar (UI) -> Importar (API).
+    Executa a rotina diária de substituição de mailing: Preparar -> Finalizar (campaign_engine) -> Importar (API).
     Chamado pelo main.py no horário de 11:00h.
     """
 
@@ -31,49 +40,81 @@ async def run_daily_import_pipeline(server: str):
 
     # 1. PREPARAÇÃO DO ARQUIVO (LOCAL)
     TODAY_FILE_SUFFIX = datetime.now().strftime(' - %d-%m') + ".csv"
-    base_name = MAILING_FILE_MAP.get(server_name)
+    base_name = get_server_config(server_name)["mailing_prefix"]
+    if not base_name:
+        print(f"[{server_name}] ❌ ERRO: Servidor sem 'mailing_prefix' no registro. Abortando.")
+        return False
     source_file_path = os.path.join(LOCAL_MAILING_BASE_DIR, f"{base_name}{TODAY_FILE_SUFFIX}")
 
     if not os.path.exists(source_file_path):
         print(f"[{server_name}] ❌ ERRO: Arquivo de origem NÃO ENCONTRADO. Abortando.")
         return False
 
-    # 2. PASSO 1: LIMPEZA/FINALIZAÇÃO DA CAMPANHA ANTIGA (Web Scraping)
-    print(f"[{server_name}] 2. Limpeza: Finalizando campanha antiga via UI...")
-    clean_success = await finalize_campaign_only(server)
+    mailling_name_for_api = base_name + datetime.now().strftime(' - %d-%m')
+
+    # 2. PASSO 1: PREPARO E CHECAGEM DE REPETIÇÃO (antes de mexer na campanha atual)
+    # Um reenvio do mesmo arquivo (retry manual, recuperação do agendador) não pode
+    # finalizar a campanha que está rodando para depois descobrir que não há o que subir.
+    try:
+        prepared = await prepare_mailling_import(
+            server=server,
+            campaign_id=TEST_IMPORT_ID,
+            file_content_base64=None,
+            source_csv_path=source_file_path,
+            mailling_name=mailling_name_for_api,
+        )
+    except Exception as e:
+        print(f"[{server_name}] ❌ ERRO CRÍTICO NO PREPARO DO MAILING: {e}")
+        _record_history(server_name, mailling_name_for_api, "Falha")
+        return False
+
+    early_result = prepared["result"]
+    if early_result is not None:
+        if early_result.get('duplicate') and early_result.get('success'):
+            print(f"[{server_name}] ♻️ Mailing já importado anteriormente. ID Lista: {early_result.get('id_lista', 'N/A')}. "
+                  f"Campanha atual mantida.")
+            _record_history(server_name, mailling_name_for_api, "Duplicado")
+            return True
+        print(f"[{server_name}] ❌ Importação não enviada: {early_result.get('erro', 'Erro desconhecido')}")
+        _record_history(server_name, mailling_name_for_api, "Falha")
+        return False
+
+    # 3. PASSO 2: LIMPEZA/FINALIZAÇÃO DA CAMPANHA ANTIGA (API quando possível, UI como fallback)
+    print(f"[{server_name}] 2. Limpeza: Finalizando campanha antiga...")
+    try:
+        clean_success = await run_finalize(server)
+    except BaseException:
+        await release_prepared_import(server, prepared)
+        raise
 
     if not clean_success:
+        await release_prepared_import(server, prepared)
         print(f"[{server_name}] ❌ Alerta: Falha na limpeza. ABORTANDO para evitar conflito.")
         return False
 
     print(f"[{server_name}] ✅ Limpeza de campanha antiga concluída.")
 
-    # 3. PASSO 2: IMPORTAÇÃO DO NOVO MAILING (API Multipart POST)
+    # 4. PASSO 3: IMPORTAÇÃO DO NOVO MAILING (API Multipart POST)
     try:
-        mailling_name_for_api = base_name + datetime.now().strftime(' - %d-%m')
-
-        upload_result = await api_import_mailling_upload(
-            server=server,
-            campaign_id=TEST_IMPORT_ID,
-            source_csv_path=source_file_path,
-            mailling_name=mailling_name_for_api,
-            login_crm=TEST_LOGIN_CRM
-        )
+        upload_result = await send_prepared_import(server, prepared, login_crm=TEST_LOGIN_CRM)
 
         if upload_result.get('success'):
             print(f"[{server_name}] ✅ SUCESSO: Upload concluído. ID Lista: {upload_result.get('id_lista', 'N/A')}")
+            _record_history(server_name, mailling_name_for_api, "Sucesso")
 
-            # 4. PASSO 3: ATIVAÇÃO
+            # 5. PASSO 4: ATIVAÇÃO
             # Aqui entraria a lógica de Web Scraping para ATIVAR a campanha com 70 canais (Se necessário).
             # Por agora, o upload API já cria a campanha, mas a ativação (subir canais) é a próxima etapa.
             print(f"[{server_name}] 4. ATIVAÇÃO PENDENTE: Iniciar discagem com 70 canais.")
 
         else:
-            print(f"[{server_name}] ❌ FALHA NO UPLOAD API: {upload_result.get('token', 'Erro desconhecido')}")
+            print(f"[{server_name}] ❌ FALHA NO UPLOAD API: {upload_result.get('erro') or upload_result.get('token', 'Erro desconhecido')}")
+            _record_history(server_name, mailling_name_for_api, "Falha")
             return False
 
     except Exception as e:
         print(f"[{server_name}] ❌ ERRO CRÍTICO NO UPLOAD: {e}")
+        _record_history(server_name, mailling_name_for_api, "Falha")
         return False
 
     print(f"--- [DAILY IMPORT - {server_name}] Pipeline Concluído! ---")
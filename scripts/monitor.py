@@ -3,22 +3,88 @@
 import asyncio
 import json
 import re
-from playwright.async_api import async_playwright
+import httpx
 # Importamos as funções que agora usam o parâmetro 'server'
-from utils.login_manager import create_context_and_login, get_base_url, get_login_url, get_server_name
+from utils.login_manager import (
+    server_session,
+    get_page_url,
+    get_server_name,
+    get_session_cookies,
+    touch_session_state
+)
+from config.settings import MONITOR_BACKEND
+from utils.http_pool import get_http_client
+
+# Regex do contador (mesma usada no texto renderizado pelo Playwright)
+ACTIVE_CALLS_PATTERN = re.compile(r'(\d+)\s+active calls')
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
 
 
 # A URL de monitoramento direta (ch.php) é construída dinamicamente
 def get_monitor_url(server: str):
     # CORREÇÃO DE PROTOCOLO: Usa o mesmo protocolo do LOGIN_URL
-    login_url = get_login_url(server)
-    return login_url.replace('pages/login.php', 'pages/ch.php')
+    return get_page_url(server, 'ch.php')
+
+
+def parse_active_calls(html: str) -> int | None:
+    """Extrai o número de active calls do HTML bruto do ch.php (None se o texto não existir)."""
+    text = HTML_TAG_PATTERN.sub(' ', html)
+    match = ACTIVE_CALLS_PATTERN.search(text)
+    return int(match.group(1)) if match else None
+
+
+async def run_monitor_http(server: str) -> dict | None:
+    """
+    Backend sem navegador: GET no ch.php com o cookie da sessão do pool/disco.
+    Retorna None quando o cookie está ausente/inválido (o chamador cai no Playwright).
+    """
+    server_name = get_server_name(server)
+    cookies = await get_session_cookies(server)
+    if not cookies:
+        return None
+
+    # Escopo "web": cliente keep-alive do pool com o cookie de sessão no próprio jar
+    client = get_http_client(server, scope="web")
+    client.cookies.clear()
+    for cookie in cookies:
+        client.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''),
+                           path=cookie.get('path', '/'))
+
+    try:
+        response = await client.get(get_monitor_url(server), follow_redirects=False)
+    except httpx.HTTPError as e:
+        print(f"[{server_name}] ⚠️ Monitor HTTP falhou ({e}). Usando Playwright.")
+        return None
+
+    # Sessão expirada: o PHP redireciona para o login ou devolve o formulário
+    if response.status_code != 200 or 'name="login"' in response.text:
+        print(f"[{server_name}] ⚠️ Cookie de sessão inválido no monitor HTTP. Usando Playwright.")
+        return None
+
+    active_calls_count = parse_active_calls(response.text)
+    if active_calls_count is None:
+        print(f"[{server_name}] ⚠️ Contador não encontrado no HTML do ch.php. Usando Playwright.")
+        return None
+
+    touch_session_state(server)
+    print(f"[{server_name}] Active Calls Encontradas (HTTP): {active_calls_count}")
+    return {"active_calls": active_calls_count, "status": "OK"}
 
 
 async def run_monitor(server: str): # Recebe o parâmetro 'server'
-    async with async_playwright() as p:
-        # 1. Recebe os 3 objetos
-        context, page, browser = await create_context_and_login(p, server=server)
+    """Lê as active calls do servidor usando o backend configurado em MONITOR_BACKEND."""
+    if MONITOR_BACKEND == "http":
+        result = await run_monitor_http(server)
+        if result is not None:
+            return result
+
+    # Fallback (ou backend "playwright"): o login do pool também renova o cookie do modo HTTP
+    return await run_monitor_playwright(server)
+
+
+async def run_monitor_playwright(server: str):
+    # 1. Reaproveita o contexto autenticado do pool (sem cold start do Chromium)
+    async with server_session(server) as (context, page):
 
         if not context:
             return {"active_calls": -1, "status": "Login Falhou"}
@@ -39,7 +105,7 @@ async def run_monitor(server: str): # Recebe o parâmetro 'server'
             await active_calls_element.wait_for(state='visible', timeout=20000) 
             full_text = await active_calls_element.inner_text()
             
-            match = re.search(r'(\d+)\s+active calls', full_text)
+            match = ACTIVE_CALLS_PATTERN.search(full_text)
 
             if match:
                 active_calls_count = int(match.group(1))
@@ -52,13 +118,3 @@ async def run_monitor(server: str): # Recebe o parâmetro 'server'
         except Exception as e:
             print(f"[{server_name}] ❌ Erro na extração ou navegação: {e}")
             return {"active_calls": -1, "status": f"Extração Falhou: {e}"}
-
-        finally:
-            if browser: # ✅ FECHA O BROWSER AQUI (Libera RAM)
-                await browser.close()
-
-
-
-
-
-
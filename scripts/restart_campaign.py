@@ -1,9 +1,20 @@
 # scripts/restart_campaign.py
 
+import os
+import time
 import asyncio
-from playwright.async_api import async_playwright
-from utils.login_manager import create_context_and_login, get_fila_name, get_server_name
-from config.settings import SAIDAS_VALOR
+from urllib.parse import urlparse
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from utils.login_manager import (
+    server_session, open_home_page, get_fila_name, get_server_name, SELETOR_MENU_AUTENTICADO
+)
+from utils.step_timer import StepTimer
+from utils.navigation import SEND_PAGE, get_learned_url, record_learned_url, forget_learned_url
+from config.servers import get_server_config
+from config.settings import (
+    RESTART_LATENCY_BUDGET_SECONDS, UI_NETWORK_IDLE_TIMEOUT_MS, UI_ACTION_RESPONSE_TIMEOUT_MS,
+    UI_FINALIZE_POST_PATH, UI_START_POST_PATH
+)
 
 # --- Constantes do Script (Seletores Validados) ---
 SELETOR_BOTAO_FINALIZAR = 'button:has-text("Finalizar Campanha")'
@@ -19,6 +30,19 @@ SELETOR_BOTAO_TELEFONE_ABRIR = 'xpath=//*[@id="Discador"]/div[1]/div/div/div/div
 # NOVO SELETOR HIERÁRQUICO
 SELETOR_LISTA_ABERTA_ITEM = 'div.dropdown-menu.open'
 
+# --- ATALHO PARA A TELA ENVIAR (URL aprendida por servidor em utils/navigation) ---
+# Tempo máximo para a tela aberta pelo atalho mostrar o painel de pendentes ou o botão Finalizar
+DEEP_LINK_VERIFY_TIMEOUT_MS = int(os.getenv("DEEP_LINK_VERIFY_TIMEOUT_MS", "10000"))
+
+# --- PRÉ-PREPARO DO RESTART (Campanha perto de zerar) ---
+# A página do pool fica parada na tela Enviar, com a campanha atual já identificada e a
+# fila conferida; o restart só executa Finalizar -> selecionar -> Subir Mailing.
+# Validade curta: as opções dos dropdowns foram renderizadas quando a tela foi aberta
+STAGED_RESTART_MAX_AGE_SECONDS = int(os.getenv("STAGED_RESTART_MAX_AGE_SECONDS", "120"))
+
+# {servidor: {"page", "url", "campaign", "staged_at"}}
+_STAGED_RESTARTS: dict[str, dict] = {}
+
 
 async def get_current_campaign_name(page) -> str | None:
     """
@@ -40,17 +64,191 @@ async def get_current_campaign_name(page) -> str | None:
         return None
 
 
+# --- ESPERAS POR CONDIÇÃO (substituem as pausas fixas) ---
+async def _wait_network_idle(page):
+    """
+    Aguarda a rede ficar ociosa após carregar um documento, com teto (páginas com polling
+    contínuo nunca ficam 100% ociosas). Não serve para ações AJAX: se o documento já atingiu
+    networkidle, retorna na hora. Para essas, use _click_and_await_post.
+    """
+    try:
+        await page.wait_for_load_state('networkidle', timeout=UI_NETWORK_IDLE_TIMEOUT_MS)
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def _pick_dropdown_option(page, option_name: str):
+    """Escolhe a opção no dropdown aberto e aguarda o menu fechar antes do próximo dropdown."""
+    open_menu = page.locator(SELETOR_LISTA_ABERTA_ITEM)
+    option = open_menu.get_by_role("option", name=option_name)
+    await option.wait_for(state='visible', timeout=10000)
+    await option.click(timeout=20000)
+    try:
+        await open_menu.first.wait_for(state='hidden', timeout=5000)
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def _resolve_post_path(page, form_selector: str, configured_path: str) -> str:
+    """Caminho do endpoint da ação: o configurado, o action do formulário do botão ou o da tela atual."""
+    if configured_path:
+        return configured_path
+    action = await page.locator(form_selector).first.evaluate(
+        "el => { const form = el.form || el.closest('form');"
+        " return el.getAttribute('formaction') || (form ? form.action : ''); }"
+    )
+    return urlparse(action or page.url).path
+
+
+async def _click_and_await_post(page, selector: str, post_path: str):
+    """
+    Clica e aguarda a resposta do POST da ação no endpoint esperado (AJAX ou envio de formulário):
+    a ação só é dada como feita quando o discador respondeu, não quando o clique aconteceu.
+    POSTs de fundo para outros endpoints (ex: atualização do painel) não contam.
+    """
+    def is_action_response(response) -> bool:
+        return response.request.method == "POST" and urlparse(response.url).path.endswith(post_path)
+
+    async with page.expect_response(is_action_response, timeout=UI_ACTION_RESPONSE_TIMEOUT_MS) as response_info:
+        await page.click(selector)
+    response = await response_info.value
+    await response.finished()
+    if not response.ok:
+        raise RuntimeError(f"Discador respondeu HTTP {response.status} em {response.url}")
+
+
+async def _confirm_finalize(page):
+    """Finalizar -> confirmação do modal, aguardando a resposta do discador e o modal fechar."""
+    await page.wait_for_selector(SELETOR_BOTAO_FINALIZAR, state='visible', timeout=10000)
+    # O botão do modal não fica em formulário: o endpoint vem do botão Finalizar da tela
+    post_path = await _resolve_post_path(page, SELETOR_BOTAO_FINALIZAR, UI_FINALIZE_POST_PATH)
+    await page.click(SELETOR_BOTAO_FINALIZAR)
+    await _click_and_await_post(page, SELETOR_CONFIRMAR_FINALIZAR, post_path)
+    await page.locator(SELETOR_CONFIRMAR_FINALIZAR).wait_for(state='hidden', timeout=10000)
+
+
+async def _open_send_page_direct(page, server: str) -> str | None:
+    """
+    Abre a tela Enviar com um único goto na URL aprendida e confere se a tela certa carregou.
+    Devolve a URL usada, ou None se não há atalho ou ele falhou. O atalho só é descartado
+    quando a página carregou autenticada e mostrou outra tela: falha de rede ou sessão
+    expirada (redirecionamento para o login) não dizem nada sobre a URL.
+    """
+    url = get_learned_url(server, SEND_PAGE)
+    if not url:
+        return None
+    try:
+        await page.goto(url, wait_until='domcontentloaded', timeout=40000)
+    except Exception as e:
+        print(f"[{get_server_name(server)}] ⚠️ Atalho para a tela Enviar não carregou ({e}). Usando o menu.")
+        return None
+
+    try:
+        send_page_ready = page.locator(SELETOR_PAINEL_PENDENTES).or_(page.locator(SELETOR_BOTAO_FINALIZAR))
+        await send_page_ready.first.wait_for(state='visible', timeout=DEEP_LINK_VERIFY_TIMEOUT_MS)
+        return url
+    except PlaywrightTimeoutError:
+        authenticated = 'login.php' not in page.url and await page.locator(SELETOR_MENU_AUTENTICADO).is_visible()
+        if authenticated:
+            print(f"[{get_server_name(server)}] ⚠️ Atalho abriu outra tela. URL descartada, usando o menu.")
+            forget_learned_url(server, SEND_PAGE)
+        else:
+            print(f"[{get_server_name(server)}] ⚠️ Atalho caiu fora da sessão autenticada. Usando o menu.")
+        return None
+
+
+async def _navigate_to_send_page(page, server: str) -> str | None:
+    """
+    Tela Enviar: atalho aprendido (goto direto) ou Home -> Discador Automático -> Preditivo -> Enviar.
+    Devolve o nome da campanha atual (None se o painel de pendentes não apareceu).
+    """
+    if await _open_send_page_direct(page, server):
+        return await get_current_campaign_name(page)
+
+    # Página do pool pode estar em outra tela: volta para a home autenticada
+    await open_home_page(page, server)
+    home_url = page.url
+
+    # Estabilização pós-login: rede ociosa (antes, pausa fixa de 5s)
+    await _wait_network_idle(page)
+
+    # Navegação (Clique Discador Automático -> Preditivo -> Enviar)
+    # O click do Playwright já espera o link do submenu ficar visível e estável (fim da animação)
+    await page.get_by_role("link", name="send Discador Automático").click()
+    await page.get_by_role("link", name="DA Preditivo").click()
+    await page.get_by_text("Enviar").click()
+
+    # A mesma espera pelo painel confirma a tela e extrai a campanha; a URL só é
+    # aprendida com a tela confirmada e se ela tem endereço próprio (não é a home)
+    current_campaign = await get_current_campaign_name(page)
+    if current_campaign and page.url != home_url:
+        record_learned_url(server, SEND_PAGE, page.url)
+    return current_campaign
+
+
+def _take_staged_restart(server: str, page) -> dict | None:
+    """Consome o pré-preparo do servidor se ainda vale para esta página (mesma página, mesma tela, recente)."""
+    staged = _STAGED_RESTARTS.pop(get_server_name(server), None)
+    if not staged or staged["page"] is not page or page.is_closed() or page.url != staged["url"]:
+        return None
+    if time.monotonic() - staged["staged_at"] > STAGED_RESTART_MAX_AGE_SECONDS:
+        return None
+    return staged
+
+
+async def prestage_restart(server: str) -> bool:
+    """
+    Deixa o restart pronto antes das chamadas zerarem: sessão válida, tela Enviar aberta,
+    campanha atual identificada e fila conferida. Não altera nada no discador.
+    """
+    server_name = get_server_name(server)
+
+    # Pré-preparo ainda válido: retorna sem pegar a sessão (o lock e o health-check
+    # a cada checagem atrasariam justamente o restart que o pré-preparo quer acelerar).
+    # A página do pool é a mesma do monitor Playwright (ch.php): fora da tela Enviar, prepara de novo.
+    staged = _STAGED_RESTARTS.get(server_name)
+    if (staged and not staged["page"].is_closed() and staged["page"].url == staged["url"]
+            and time.monotonic() - staged["staged_at"] <= STAGED_RESTART_MAX_AGE_SECONDS):
+        return True
+
+    async with server_session(server) as (context, page):
+        if not context:
+            return False
+
+        try:
+            print(f"[{server_name}] 🔮 Pré-preparando restart (campanha perto de zerar)...")
+            current_campaign = await _navigate_to_send_page(page, server)
+            if not current_campaign:
+                print(f"[{server_name}] ⚠️ Pré-preparo: nome da campanha não encontrado.")
+                return False
+
+            fila_name = get_fila_name(server)
+            if await page.locator('select option', has_text=fila_name).count() == 0:
+                print(f"[{server_name}] ⚠️ Pré-preparo: fila '{fila_name}' não encontrada nas opções.")
+                return False
+
+            _STAGED_RESTARTS[server_name] = {
+                "page": page, "url": page.url, "campaign": current_campaign, "staged_at": time.monotonic()
+            }
+            print(f"[{server_name}] ✅ Restart pré-preparado: {current_campaign} / {fila_name}")
+            return True
+
+        except Exception as e:
+            print(f"[{server_name}] ⚠️ Falha no pré-preparo do restart: {e}")
+            return False
+
+
 # --- FUNÇÃO ISOLADA PARA LIMPEZA (CHAMADA PELO DAILY WORKER) ---
 async def finalize_campaign_only(server: str):
     """Navega até a página de envio e executa apenas a finalização da campanha atual."""
-    async with async_playwright() as p:
-        # 1. Recebe os 3 objetos (context, page, browser)
-        context, page, browser = await create_context_and_login(p, server=server)
+    # 1. Reaproveita o contexto autenticado do pool (login só se a sessão expirou)
+    async with server_session(server) as (context, page):
 
         if not context:
             return False
 
         server_name = get_server_name(server)
+        timer = StepTimer(f"{server_name} - Finalização", RESTART_LATENCY_BUDGET_SECONDS)
 
         try:
             # ----------------------------------------------------
@@ -58,18 +256,11 @@ async def finalize_campaign_only(server: str):
             # ----------------------------------------------------
             print(f"[{server_name}] 1. Navegando para Finalização de Campanha...")
 
-            # Estabilização pós-login
-            await page.wait_for_timeout(5000)
-
-            # Navegação (Clique Discador Automático -> Preditivo -> Enviar)
-            await page.get_by_role("link", name="send Discador Automático").click()
-            await page.wait_for_timeout(200)
-            await page.get_by_role("link", name="DA Preditivo").click()
-            await page.wait_for_timeout(1000)
-            await page.get_by_text("Enviar").click()
-
+            # A troca de mailing invalida qualquer restart pré-preparado
+            _STAGED_RESTARTS.pop(server_name, None)
             # Extração (Necessário para a próxima etapa, mas não para a finalização em si)
-            current_campaign = await get_current_campaign_name(page)
+            current_campaign = await _navigate_to_send_page(page, server)
+            timer.lap("navegação")
 
             if not current_campaign:
                 print(
@@ -78,10 +269,8 @@ async def finalize_campaign_only(server: str):
             print(f"[{server_name}] 2. Finalizando Campanha atual via UI...")
 
             # Finalização (O ponto final da rotina de limpeza)
-            await page.wait_for_selector(SELETOR_BOTAO_FINALIZAR, state='visible', timeout=10000)
-            await page.click(SELETOR_BOTAO_FINALIZAR)
-            await page.click(SELETOR_CONFIRMAR_FINALIZAR)
-            await page.wait_for_timeout(1000)
+            await _confirm_finalize(page)
+            timer.lap("finalizar")
 
             print(f"[{server_name}] ✅ Campanha antiga finalizada com sucesso.")
             return True
@@ -91,37 +280,39 @@ async def finalize_campaign_only(server: str):
             return False
 
         finally:
-            if browser:  # ✅ GARANTIA DE RECURSOS: Fecha o navegador após cada ciclo.
-                await browser.close()
+            timer.report()
 
 async def restart_campaign(server: str): 
-    async with async_playwright() as p:
-        # 1. Recebe os 3 objetos (context, page, browser)
-        context, page, browser = await create_context_and_login(p, server=server)
+    # 1. Reaproveita o contexto autenticado do pool (login só se a sessão expirou)
+    async with server_session(server) as (context, page):
 
         if not context:
             return False
 
         server_name = get_server_name(server)
         fila_name = get_fila_name(server)
+        saidas_valor = get_server_config(server)["saidas"]
+        timer = StepTimer(f"{server_name} - Restart", RESTART_LATENCY_BUDGET_SECONDS)
 
         try:
             # ----------------------------------------------------
             # ETAPA 1: NAVEGAÇÃO, EXTRAÇÃO E FINALIZAÇÃO
             # ----------------------------------------------------
-            print(f"[{server_name}] 1. Navegando para Envio de Campanhas e extraindo nome da campanha...")
-
-            # Estabilização pós-login
-            await page.wait_for_timeout(5000) 
-
-            # Navegação (Clique Discador Automático -> Preditivo -> Enviar)
-            await page.get_by_role("link", name="send Discador Automático").click()
-            await page.wait_for_timeout(200) 
-            await page.get_by_role("link", name="DA Preditivo").click()
-            await page.wait_for_timeout(1000)
-            await page.get_by_text("Enviar").click()
-
-            current_campaign = await get_current_campaign_name(page)
+            # Pré-preparo válido: a tela Enviar já está aberta e a campanha identificada
+            staged = _take_staged_restart(server, page)
+            current_campaign = None
+            if staged and await page.locator(SELETOR_BOTAO_FINALIZAR).is_visible():
+                print(f"[{server_name}] ⚡ 1. Usando restart pré-preparado (tela Enviar já aberta).")
+                # Relê a campanha na tela (o painel já está visível: leitura imediata)
+                current_campaign = await get_current_campaign_name(page)
+                if current_campaign != staged["campaign"]:
+                    print(f"[{server_name}] ⚠️ Campanha mudou desde o pré-preparo "
+                          f"({staged['campaign']} -> {current_campaign}). Reabrindo a tela Enviar.")
+                    current_campaign = None
+            if not current_campaign:
+                print(f"[{server_name}] 1. Navegando para Envio de Campanhas e extraindo nome da campanha...")
+                current_campaign = await _navigate_to_send_page(page, server)
+            timer.lap("navegação")
 
             if not current_campaign:
                 print(f"[{server_name}] ⚠️ Alerta: Não foi possível obter o nome da campanha. Abortando restart.")
@@ -130,12 +321,8 @@ async def restart_campaign(server: str):
             print(f"[{server_name}] ✅ Campanha atual identificada: {current_campaign}")
 
             print(f"[{server_name}] 2. Finalizando Campanha atual...")
-            await page.wait_for_selector(SELETOR_BOTAO_FINALIZAR, state='visible', timeout=10000)
-            await page.click(SELETOR_BOTAO_FINALIZAR)
-            
-            # ✅ CORREÇÃO: Usando a constante correta
-            await page.click(SELETOR_CONFIRMAR_FINALIZAR) 
-            await page.wait_for_timeout(1000) 
+            await _confirm_finalize(page)
+            timer.lap("finalizar")
 
             # ----------------------------------------------------
             # ETAPA 3: RECONFIGURAÇÃO E DISPARO (AÇÕES OTIMIZADAS/ROBUSTAS)
@@ -143,38 +330,28 @@ async def restart_campaign(server: str):
             print(f"[{server_name}] 3. Reconfigurando e disparando o mailing...")
 
             # AÇÃO A: Selecionar a CAMPANHA
+            # (cada escolha aguarda a opção aparecer e o menu fechar, sem pausas fixas)
             await page.get_by_role("button", name="Escolha a opção").first.click()
-            # ✅ CORREÇÃO: Restaurando espera de sincronia de 500ms
-            await page.wait_for_timeout(500) 
-            
-            await page.locator(SELETOR_LISTA_ABERTA_ITEM).get_by_role("option", name=current_campaign).wait_for(state='visible', timeout=10000) 
-            await page.locator(SELETOR_LISTA_ABERTA_ITEM).get_by_role("option", name=current_campaign).click(
-                timeout=20000) 
+            await _pick_dropdown_option(page, current_campaign)
+            timer.lap("campanha")
 
             # AÇÃO B: SELECIONAR TELEFONE/MAILING
             await page.click(SELETOR_BOTAO_TELEFONE_ABRIR)
-            # ✅ CORREÇÃO: Restaurando espera de sincronia de 500ms
-            await page.wait_for_timeout(500) 
-            
-            await page.locator(SELETOR_LISTA_ABERTA_ITEM).get_by_role("option", name=current_campaign).wait_for(state='visible', timeout=10000)
-            await page.locator(SELETOR_LISTA_ABERTA_ITEM).get_by_role("option", name=current_campaign).click(
-                timeout=20000) 
+            await _pick_dropdown_option(page, current_campaign)
+            timer.lap("telefone")
 
             # AÇÃO C: Selecionar a FILA DE ATENDIMENTO
             await page.click(SELETOR_BOTAO_FILA_ABRIR)
-            # ✅ CORREÇÃO: Restaurando espera de sincronia de 500ms
-            await page.wait_for_timeout(500) 
-            
-            await page.locator(SELETOR_LISTA_ABERTA_ITEM).get_by_role("option", name=fila_name).wait_for(state='visible', timeout=10000)
-            await page.locator(SELETOR_LISTA_ABERTA_ITEM).get_by_role("option", name=fila_name).click(timeout=20000)
+            await _pick_dropdown_option(page, fila_name)
+            timer.lap("fila")
 
             # AÇÃO D: Preencher Saídas
-            await page.fill(SELETOR_INPUT_SAIDAS, SAIDAS_VALOR)
+            await page.fill(SELETOR_INPUT_SAIDAS, saidas_valor)
 
-            # AÇÃO E: Clicar no BOTÃO DE ENVIO (Subir Mailing)
-            await page.click(SELETOR_BOTAO_SUBIR_MAILING)
-            
-            await page.wait_for_timeout(2000) 
+            # AÇÃO E: Clicar no BOTÃO DE ENVIO (Subir Mailing) e aguardar o envio terminar
+            post_path = await _resolve_post_path(page, SELETOR_BOTAO_SUBIR_MAILING, UI_START_POST_PATH)
+            await _click_and_await_post(page, SELETOR_BOTAO_SUBIR_MAILING, post_path)
+            timer.lap("envio")
 
             print(f"[{server_name}] ✅ Campanhas reconfigurada e subida com sucesso!")
             return True
@@ -184,13 +361,20 @@ async def restart_campaign(server: str):
             return False
 
         finally:
-            if browser: # ✅ GARANTIA DE RECURSOS: Fecha o navegador após cada ciclo.
-                await browser.close()
+            timer.report()
 
 
 if __name__ == '__main__':
     import asyncio
-    asyncio.run(restart_campaign(server="MG"))
+    from utils.login_manager import close_browser_pool
+
+    async def _run_once():
+        try:
+            await restart_campaign(server="MG")
+        finally:
+            await close_browser_pool()
+
+    asyncio.run(_run_once())
     # Loga, extrai nome da campanha em execução, finaliza campanha,
     # reconfigura os 3 dropdowns (Campanha, Telefone, Fila) e envia o mailing.
 
@@ -0,0 +1,103 @@
+# tests/test_scheduler.py (Agendador de Jobs: regras de execução e loop)
+
+import asyncio
+import datetime
+
+import pytest
+
+from utils.scheduler import Job, IntervalJob, DailyJob, JobScheduler
+
+
+async def _noop():
+    pass
+
+
+def test_job_base_is_abstract():
+    with pytest.raises(TypeError):
+        Job("abstrato", _noop)
+
+
+def test_daily_job_next_run_skips_other_weekdays():
+    job = DailyJob("diario", _noop, hour=11, weekdays=range(5))  # segunda a sexta
+    friday_noon = datetime.datetime(2025, 1, 10, 12, 0)
+    assert job.next_run_after(friday_noon) == datetime.datetime(2025, 1, 13, 11, 0)
+
+
+def test_daily_job_without_last_run_does_not_catch_up():
+    # DATA_DIR novo (redeploy): sem marcador, não repete finalizar + importar no meio do dia
+    job = DailyJob("diario", _noop, hour=11, catch_up_seconds=4 * 60 * 60)
+    now = datetime.datetime(2025, 1, 10, 12, 0)
+    assert job.initial_run(now, None) == datetime.datetime(2025, 1, 11, 11, 0)
+
+
+def test_daily_job_catches_up_missed_run_within_limit():
+    job = DailyJob("diario", _noop, hour=11, catch_up_seconds=4 * 60 * 60)
+    now = datetime.datetime(2025, 1, 10, 12, 0)
+    yesterday = datetime.datetime(2025, 1, 9, 11, 0)
+    assert job.initial_run(now, yesterday) == now
+
+
+def test_daily_job_does_not_catch_up_after_limit_or_when_done():
+    job = DailyJob("diario", _noop, hour=11, catch_up_seconds=60 * 60)
+    tomorrow = datetime.datetime(2025, 1, 11, 11, 0)
+    yesterday = datetime.datetime(2025, 1, 9, 11, 0)
+    today = datetime.datetime(2025, 1, 10, 11, 0, 5)
+    assert job.initial_run(datetime.datetime(2025, 1, 10, 15, 0), yesterday) == tomorrow
+    assert job.initial_run(datetime.datetime(2025, 1, 10, 11, 30), today) == tomorrow
+
+
+def test_interval_job_respects_window_and_callable_interval():
+    opening = datetime.datetime(2025, 1, 10, 8, 0)
+    job = IntervalJob("monitor", _noop, interval_seconds=lambda: 30,
+                      window=lambda moment: max(moment, opening))
+    assert job.initial_run(datetime.datetime(2025, 1, 10, 6, 0), None) == opening
+    assert job.next_run_after(opening) == opening + datetime.timedelta(seconds=30)
+
+
+def _run_scheduler_for(scheduler: JobScheduler, seconds: float):
+    async def runner():
+        try:
+            await asyncio.wait_for(scheduler.run_forever(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+    asyncio.run(runner())
+
+
+def test_scheduler_repeats_interval_jobs(tmp_path):
+    runs = []
+
+    async def tick():
+        runs.append(datetime.datetime.now())
+
+    scheduler = JobScheduler([IntervalJob("tick", tick, interval_seconds=0.05)],
+                             state_file=str(tmp_path / "state.json"))
+    _run_scheduler_for(scheduler, 0.4)
+    assert len(runs) >= 3
+
+
+def test_exclusive_job_waits_for_running_jobs(tmp_path):
+    events = []
+
+    async def slow():
+        events.append("lento:inicio")
+        await asyncio.sleep(0.2)
+        events.append("lento:fim")
+
+    async def exclusive():
+        events.append("exclusivo")
+
+    jobs = [
+        IntervalJob("lento", slow, interval_seconds=60),
+        IntervalJob("exclusivo", exclusive, interval_seconds=60, exclusive=True),
+    ]
+    _run_scheduler_for(JobScheduler(jobs, state_file=str(tmp_path / "state.json")), 0.5)
+    assert events == ["lento:inicio", "lento:fim", "exclusivo"]
+
+
+def test_daily_job_persists_last_run(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    job = DailyJob("diario", _noop, hour=0)
+    scheduler = JobScheduler([job], state_file=state_file)
+    started_at = datetime.datetime(2025, 1, 10, 0, 0, 1)
+    scheduler._save_last_run(job, started_at)
+    assert JobScheduler([job], state_file=state_file).get_last_run(job) == started_at
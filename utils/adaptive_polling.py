@@ -0,0 +1,137 @@
+# utils/adaptive_polling.py (Intervalo de Monitoramento Adaptativo por Servidor)
+
+import os
+import time
+from collections import deque
+
+# O intervalo de cada servidor acompanha a tendência das chamadas ativas:
+#   - estável e alto  -> espaça as checagens (até o máximo)
+#   - caindo          -> aproxima as checagens da previsão de zerar
+#   - baixo / zerado  -> checa no mínimo (é quando o restart precisa ser rápido)
+MONITOR_BASE_INTERVAL_SECONDS = int(os.getenv("MONITOR_BASE_INTERVAL_SECONDS", "15"))
+MONITOR_MIN_INTERVAL_SECONDS = int(os.getenv("MONITOR_MIN_INTERVAL_SECONDS", "5"))
+MONITOR_MAX_INTERVAL_SECONDS = int(os.getenv("MONITOR_MAX_INTERVAL_SECONDS", "60"))
+
+POLLING_HISTORY_SIZE = 8  # Leituras consideradas na tendência
+LOW_CALLS_THRESHOLD = 5  # Abaixo disso: intervalo mínimo
+STABLE_CALLS_REFERENCE = 20  # Cada 20 chamadas estáveis somam um intervalo base (60 chamadas -> 4x)
+NEAR_END_PROGRESS_PERCENT = 90  # Campanha quase no fim: não espaça além do intervalo base
+DRAIN_CHECKS_BEFORE_ZERO = 4  # Checagens desejadas até a previsão de zerar
+
+# Pré-preparo do restart: quando a previsão de zerar fica abaixo deste prazo
+# (ou a campanha está quase no fim), a tela de restart é deixada pronta
+PRESTAGE_RESTART_ENABLED = os.getenv("PRESTAGE_RESTART_ENABLED", "true").lower() == "true"
+PRESTAGE_LEAD_SECONDS = int(os.getenv("PRESTAGE_LEAD_SECONDS", "180"))
+PRESTAGE_PROGRESS_PERCENT = int(os.getenv("PRESTAGE_PROGRESS_PERCENT", "95"))
+
+# Carência pós-restart: a campanha recém-subida costuma reportar 0 chamadas por alguns
+# segundos; um novo restart nesse período finalizaria a campanha que acabou de subir.
+# A carência termina na primeira leitura com chamadas ou quando o prazo vence.
+RESTART_GRACE_SECONDS = int(os.getenv("RESTART_GRACE_SECONDS", "120"))
+
+_HISTORY: dict[str, deque] = {}
+_PROGRESS: dict[str, float] = {}
+_RESTARTED_AT: dict[str, float] = {}
+
+
+def record_poll_observation(server: str, active_calls: int, progresso: float | None = None):
+    """Registra a leitura do monitor (chamadas < 0 = leitura inválida, zera a tendência)."""
+    history = _HISTORY.setdefault(server.upper(), deque(maxlen=POLLING_HISTORY_SIZE))
+    if active_calls < 0:
+        history.clear()
+    else:
+        history.append((time.monotonic(), active_calls))
+    if active_calls > 0:
+        _RESTARTED_AT.pop(server.upper(), None)  # Campanha nova discando: fim da carência
+    if progresso is not None:
+        _PROGRESS[server.upper()] = progresso
+
+
+def mark_restart(server: str):
+    """Registra um restart bem-sucedido: abre a carência e descarta a tendência da campanha anterior."""
+    _RESTARTED_AT[server.upper()] = time.monotonic()
+    _HISTORY.pop(server.upper(), None)
+    _PROGRESS.pop(server.upper(), None)
+
+
+def restart_grace_remaining(server: str) -> float:
+    """Segundos restantes da carência pós-restart (0 = restart liberado)."""
+    restarted_at = _RESTARTED_AT.get(server.upper())
+    if restarted_at is None:
+        return 0.0
+    remaining = RESTART_GRACE_SECONDS - (time.monotonic() - restarted_at)
+    if remaining <= 0:
+        _RESTARTED_AT.pop(server.upper(), None)
+        return 0.0
+    return remaining
+
+
+def get_calls_trend(server: str) -> float | None:
+    """Inclinação (chamadas por segundo) por mínimos quadrados nas últimas leituras. None sem dados."""
+    history = _HISTORY.get(server.upper())
+    if not history or len(history) < 2:
+        return None
+    start = history[0][0]
+    xs = [ts - start for ts, _ in history]
+    ys = [calls for _, calls in history]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def estimate_seconds_to_zero(server: str) -> float | None:
+    """Previsão de quando as chamadas zeram, pela tendência atual. None se não estão caindo."""
+    history = _HISTORY.get(server.upper())
+    trend = get_calls_trend(server)
+    if not history or trend is None or trend >= 0:
+        return None
+    return history[-1][1] / -trend
+
+
+def next_poll_interval(server: str) -> float:
+    """Intervalo até a próxima checagem do servidor, dentro de [mínimo, máximo]."""
+    history = _HISTORY.get(server.upper())
+    if not history:
+        return MONITOR_BASE_INTERVAL_SECONDS
+
+    grace = restart_grace_remaining(server)
+    if grace > 0:
+        # Zero durante a carência não dispara restart: não adianta checar no intervalo mínimo
+        return max(MONITOR_MIN_INTERVAL_SECONDS, min(MONITOR_BASE_INTERVAL_SECONDS, grace))
+
+    last_calls = history[-1][1]
+    if last_calls <= LOW_CALLS_THRESHOLD:
+        interval = MONITOR_MIN_INTERVAL_SECONDS
+    else:
+        seconds_to_zero = estimate_seconds_to_zero(server)
+        if seconds_to_zero is not None:
+            interval = seconds_to_zero / DRAIN_CHECKS_BEFORE_ZERO
+        else:
+            interval = MONITOR_BASE_INTERVAL_SECONDS * (1 + last_calls / STABLE_CALLS_REFERENCE)
+
+        progresso = _PROGRESS.get(server.upper())
+        if progresso is not None and progresso >= NEAR_END_PROGRESS_PERCENT:
+            interval = min(interval, MONITOR_BASE_INTERVAL_SECONDS)
+
+    return max(MONITOR_MIN_INTERVAL_SECONDS, min(MONITOR_MAX_INTERVAL_SECONDS, interval))
+
+
+def should_prestage_restart(server: str) -> bool:
+    """Campanha deve zerar em breve (tendência, poucas chamadas ou progresso no fim)?"""
+    if not PRESTAGE_RESTART_ENABLED:
+        return False
+    history = _HISTORY.get(server.upper())
+    if not history or history[-1][1] == 0:
+        return False
+    if history[-1][1] <= LOW_CALLS_THRESHOLD:
+        return True
+
+    seconds_to_zero = estimate_seconds_to_zero(server)
+    if seconds_to_zero is not None and seconds_to_zero <= PRESTAGE_LEAD_SECONDS:
+        return True
+
+    progresso = _PROGRESS.get(server.upper())
+    return progresso is not None and progresso >= PRESTAGE_PROGRESS_PERCENT
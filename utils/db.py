@@ -0,0 +1,63 @@
+# utils/db.py (Conexões SQLite Compartilhadas em DATA_DIR)
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from config.settings import DATA_DIR
+
+# O scheduler (main.py) e o painel (app.py) rodam em processos separados e
+# compartilham os mesmos arquivos. WAL permite leituras concorrentes com uma escrita;
+# o busy_timeout faz o outro processo aguardar a trava em vez de falhar.
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+
+_CONNECTIONS: dict[str, tuple[sqlite3.Connection, threading.Lock]] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def _open(db_name: str) -> sqlite3.Connection:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(
+        os.path.join(DATA_DIR, db_name),
+        timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+        isolation_level=None,  # Transações explícitas (BEGIN IMMEDIATE)
+        check_same_thread=False,  # Uso serializado pelo lock da conexão
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _get_connection(db_name: str) -> tuple[sqlite3.Connection, threading.Lock]:
+    with _CONNECTIONS_LOCK:
+        entry = _CONNECTIONS.get(db_name)
+        if entry is None:
+            entry = (_open(db_name), threading.Lock())
+            _CONNECTIONS[db_name] = entry
+        return entry
+
+
+@contextmanager
+def transaction(db_name: str):
+    """
+    Abre (ou reaproveita) a conexão do arquivo DATA_DIR/<db_name> e executa o bloco
+    em uma transação de escrita (BEGIN IMMEDIATE): commit no sucesso, rollback no erro.
+    """
+    conn, lock = _get_connection(db_name)
+    with lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+@contextmanager
+def reading(db_name: str):
+    """Conexão para consultas (sem transação de escrita)."""
+    conn, lock = _get_connection(db_name)
+    with lock:
+        yield conn
@@ -0,0 +1,83 @@
+# utils/event_broker.py (Canal de Push para o Painel via Server-Sent Events)
+
+import os
+import json
+import time
+import queue
+import threading
+
+# Cada navegador conectado em /events recebe uma fila própria e limitada. O coletor publica
+# sem nunca bloquear: se um cliente lento encher a fila, o evento mais antigo é descartado
+# (os callbacks do painel releem o estado atual, então perder um aviso intermediário é inofensivo).
+EVENT_CLIENT_QUEUE_SIZE = 20
+EVENT_HEARTBEAT_SECONDS = 15  # Comentário SSE periódico: mantém proxies abertos e detecta desconexão
+EVENT_RETRY_MILLISECONDS = 5000  # Intervalo de reconexão sugerido ao EventSource
+
+# Cada conexão ocupa um thread do servidor: limite de conexões simultâneas e duração
+# máxima de cada uma (o EventSource reconecta sozinho ao fim; conexões mortas que
+# escaparam da detecção pelo keepalive liberam o thread no prazo)
+EVENT_MAX_CLIENTS = int(os.getenv("EVENT_MAX_CLIENTS", "20"))
+EVENT_CONNECTION_MAX_SECONDS = int(os.getenv("EVENT_CONNECTION_MAX_SECONDS", "300"))
+
+_SUBSCRIBERS: set[queue.Queue] = set()
+_SUBSCRIBERS_LOCK = threading.Lock()
+
+
+def subscribe() -> queue.Queue:
+    client_queue = queue.Queue(maxsize=EVENT_CLIENT_QUEUE_SIZE)
+    with _SUBSCRIBERS_LOCK:
+        _SUBSCRIBERS.add(client_queue)
+    return client_queue
+
+
+def unsubscribe(client_queue: queue.Queue):
+    with _SUBSCRIBERS_LOCK:
+        _SUBSCRIBERS.discard(client_queue)
+
+
+def get_subscriber_count() -> int:
+    with _SUBSCRIBERS_LOCK:
+        return len(_SUBSCRIBERS)
+
+
+def has_capacity() -> bool:
+    """Ainda cabe mais uma conexão em /events?"""
+    return get_subscriber_count() < EVENT_MAX_CLIENTS
+
+
+def publish_event(event: str, data: dict):
+    """Envia o evento a todos os clientes conectados (thread-safe, não bloqueante)."""
+    message = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    with _SUBSCRIBERS_LOCK:
+        subscribers = list(_SUBSCRIBERS)
+    for client_queue in subscribers:
+        while True:
+            try:
+                client_queue.put_nowait(message)
+                break
+            except queue.Full:
+                try:
+                    client_queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+def iter_event_stream():
+    """
+    Gerador do corpo text/event-stream de um cliente (usado pela rota /events do Flask).
+    Cada conexão ocupa um thread do servidor e termina após EVENT_CONNECTION_MAX_SECONDS.
+    """
+    client_queue = subscribe()
+    deadline = time.monotonic() + EVENT_CONNECTION_MAX_SECONDS
+    try:
+        yield f"retry: {EVENT_RETRY_MILLISECONDS}\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                yield client_queue.get(timeout=min(EVENT_HEARTBEAT_SECONDS, remaining))
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    finally:
+        unsubscribe(client_queue)
@@ -0,0 +1,62 @@
+# utils/http_pool.py (Pool de Clientes HTTP Compartilhado)
+
+import asyncio
+import threading
+import weakref
+import httpx
+from config.servers import get_server_config
+from config.settings import (
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS
+)
+
+# Um httpx.AsyncClient só pode ser usado no event loop em que foi criado.
+# Por isso o pool é indexado por loop -> (escopo, servidor). Quando um loop
+# é descartado, seus clientes saem do pool junto (WeakKeyDictionary).
+#   escopo "api": chamadas da API REST (list_campaign, campaign_exec, import_mailling)
+#   escopo "web": páginas do sistema com cookie de sessão (ex: ch.php do monitor)
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[str, str], httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _build_client(server: str) -> httpx.AsyncClient:
+    limits = get_server_config(server)["limits"]
+    return httpx.AsyncClient(
+        verify=False,
+        timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=limits["http_max_connections"],
+            max_keepalive_connections=min(HTTP_MAX_KEEPALIVE_CONNECTIONS, limits["http_max_connections"]),
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+
+
+def get_http_client(server: str, scope: str = "api") -> httpx.AsyncClient:
+    """
+    Retorna o cliente keep-alive do servidor para o event loop atual (cria na primeira chamada).
+    Deve ser chamado de dentro de uma corotina.
+    """
+    loop = asyncio.get_running_loop()
+    key = (scope, server.upper())
+    with _CLIENTS_LOCK:
+        loop_clients = _CLIENTS.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None or client.is_closed:
+            client = _build_client(server)
+            loop_clients[key] = client
+        return client
+
+
+async def close_http_clients():
+    """
+    Fecha os clientes do event loop atual.
+    Hook de ciclo de vida: fim do scheduler (main.py) e shutdown do loop da bridge do Dash (app.py).
+    """
+    loop = asyncio.get_running_loop()
+    with _CLIENTS_LOCK:
+        loop_clients = _CLIENTS.pop(loop, {})
+    for client in loop_clients.values():
+        await client.aclose()
@@ -0,0 +1,101 @@
+# utils/import_history.py (Histórico Persistido de Importações de Mailing)
+
+import time
+import datetime
+from utils.db import transaction, reading
+
+# Histórico em SQLite (DATA_DIR/import_history.db), gravado pelo painel (importação manual)
+# e pelo worker diário (main.py). Índices por data e por servidor+data permitem
+# paginar/filtrar no próprio banco: o custo de uma página não cresce com o histórico.
+IMPORT_HISTORY_DB = "import_history.db"
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS import_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL NOT NULL,
+        server TEXT NOT NULL,
+        mailing TEXT,
+        status TEXT NOT NULL,
+        progresso_final TEXT,
+        origem TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_import_history_ts ON import_history (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_import_history_server_ts ON import_history (server, ts)",
+)
+
+_SCHEMA_READY = False
+
+
+def _ensure_schema(conn):
+    global _SCHEMA_READY
+    if not _SCHEMA_READY:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        _SCHEMA_READY = True
+
+
+def _row_to_entry(row) -> dict:
+    return {
+        'data': datetime.datetime.fromtimestamp(row['ts']).strftime('%Y-%m-%d %H:%M:%S'),
+        'servidor': row['server'],
+        'mailing': row['mailing'],
+        'status': row['status'],
+        'progresso_final': row['progresso_final'],
+    }
+
+
+def record_import(server: str, mailing: str, status: str, progresso_final=None, origem: str = "painel") -> dict:
+    """Grava uma importação no histórico e devolve o registro no formato da tabela do painel."""
+    ts = time.time()
+    with transaction(IMPORT_HISTORY_DB) as conn:
+        _ensure_schema(conn)
+        conn.execute(
+            "INSERT INTO import_history (ts, server, mailing, status, progresso_final, origem) VALUES (?, ?, ?, ?, ?, ?)",
+            (ts, server.upper(), mailing, status, None if progresso_final is None else str(progresso_final), origem),
+        )
+    return {
+        'data': datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'),
+        'servidor': server.upper(),
+        'mailing': mailing,
+        'status': status,
+        'progresso_final': progresso_final,
+    }
+
+
+def get_history_version() -> int:
+    """Id do último registro (muda a cada gravação, de qualquer processo). Barato: usa a chave primária."""
+    with reading(IMPORT_HISTORY_DB) as conn:
+        _ensure_schema(conn)
+        row = conn.execute("SELECT MAX(id) FROM import_history").fetchone()
+    return row[0] or 0
+
+
+def query_imports(server: str | None = None, date_from: str | None = None, date_to: str | None = None,
+                  page: int = 1, page_size: int = 20) -> tuple[list[dict], int]:
+    """
+    Uma página do histórico (mais recentes primeiro) e o total de registros do filtro.
+    date_from/date_to no formato 'YYYY-MM-DD' (ambos inclusivos).
+    """
+    conditions, params = [], []
+    if server:
+        conditions.append("server = ?")
+        params.append(server.upper())
+    if date_from:
+        conditions.append("ts >= ?")
+        params.append(datetime.datetime.strptime(date_from[:10], '%Y-%m-%d').timestamp())
+    if date_to:
+        conditions.append("ts < ?")
+        end = datetime.datetime.strptime(date_to[:10], '%Y-%m-%d') + datetime.timedelta(days=1)
+        params.append(end.timestamp())
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with reading(IMPORT_HISTORY_DB) as conn:
+        _ensure_schema(conn)
+        total = conn.execute(f"SELECT COUNT(*) FROM import_history {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM import_history {where} ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+            params + [page_size, (max(page, 1) - 1) * page_size],
+        ).fetchall()
+    return [_row_to_entry(row) for row in rows], total
@@ -0,0 +1,147 @@
+# utils/import_index.py (Índice Persistido de Importações de Mailing)
+
+import os
+import time
+from utils.db import transaction, reading
+
+# Registro das importações indexadas por (servidor, hash do conteúdo transformado),
+# em SQLite (DATA_DIR/imports.db) para ser compartilhado entre o scheduler e o painel:
+#   status "pendente" -> alguém está importando este conteúdo agora
+#   status "importado" -> aceito pelo discador (id_lista disponível)
+#   status "incerto"  -> o envio caiu por timeout: a lista pode ter sido criada
+# Vale tanto para o arquivo inteiro quanto para cada parte de uma importação em partes
+# (chave da parte = "<hash do arquivo>:P<n>/<total>", removida quando o arquivo é importado).
+IMPORT_INDEX_DB = "imports.db"
+
+# Reivindicação "pendente" mais antiga que isso é considerada abandonada (processo caiu)
+IMPORT_PENDING_TTL_SECONDS = int(os.getenv("IMPORT_PENDING_TTL_SECONDS", "1800"))
+
+# Janela de repetição: conteúdo importado (ou incerto) há mais tempo que isso volta a ser
+# aceito (ex: a mesma base reenviada no dia seguinte) e o registro é removido do índice
+IMPORT_DUPLICATE_WINDOW_SECONDS = int(os.getenv("IMPORT_DUPLICATE_WINDOW_HOURS", "12")) * 60 * 60
+
+STATUS_PENDING = "pendente"
+STATUS_IMPORTED = "importado"
+STATUS_UNCERTAIN = "incerto"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS imports (
+    server TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    id_lista TEXT,
+    mailling_name TEXT,
+    claimed_at REAL NOT NULL,
+    imported_at TEXT,
+    PRIMARY KEY (server, content_hash)
+)
+"""
+
+_SCHEMA_READY = False
+
+
+def _ensure_schema(conn):
+    global _SCHEMA_READY
+    if not _SCHEMA_READY:
+        conn.execute(_SCHEMA)
+        _SCHEMA_READY = True
+
+
+def _row_to_dict(row) -> dict:
+    return {
+        "status": row["status"],
+        "id_lista": row["id_lista"],
+        "mailling_name": row["mailling_name"],
+        "imported_at": row["imported_at"],
+    }
+
+
+def get_imported_part(server: str, content_hash: str) -> dict | None:
+    """Retorna o registro da parte (id_lista, nome, data) se foi importada com sucesso dentro da janela."""
+    with reading(IMPORT_INDEX_DB) as conn:
+        _ensure_schema(conn)
+        row = conn.execute(
+            "SELECT * FROM imports WHERE server = ? AND content_hash = ? AND status = ? AND claimed_at >= ?",
+            (server.upper(), content_hash, STATUS_IMPORTED, time.time() - IMPORT_DUPLICATE_WINDOW_SECONDS),
+        ).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def record_imported_part(server: str, content_hash: str, id_lista, mailling_name: str):
+    """Marca o conteúdo (arquivo ou parte) como importado."""
+    with transaction(IMPORT_INDEX_DB) as conn:
+        _ensure_schema(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO imports VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (server.upper(), content_hash, STATUS_IMPORTED, None if id_lista is None else str(id_lista),
+             mailling_name, time.time(), time.strftime('%Y-%m-%d %H:%M:%S')),
+        )
+
+
+def part_key(content_hash: str, number: int, total: int) -> str:
+    """Chave de uma parte no índice: só vale dentro da importação do arquivo (mesmo hash e divisão)."""
+    return f"{content_hash}:P{number}/{total}"
+
+
+def forget_import_parts(server: str, content_hash: str):
+    """Remove as partes de uma importação concluída (não podem ser retomadas por outra importação)."""
+    with transaction(IMPORT_INDEX_DB) as conn:
+        _ensure_schema(conn)
+        conn.execute(
+            "DELETE FROM imports WHERE server = ? AND content_hash LIKE ?",
+            (server.upper(), f"{content_hash}:P%"),
+        )
+
+
+def claim_import(server: str, content_hash: str, mailling_name: str, force: bool = False) -> dict | None:
+    """
+    Reivindica a importação de um conteúdo (atômico entre processos).
+    Retorna None se a reivindicação foi feita (pode enviar) ou o registro existente
+    (importado, incerto ou pendente em outro processo) se o conteúdo é repetido.
+    force=True passa por cima de importado/incerto, mas nunca de um envio em andamento.
+    """
+    now = time.time()
+    with transaction(IMPORT_INDEX_DB) as conn:
+        _ensure_schema(conn)
+        # Retenção: registros fora da janela de repetição não bloqueiam mais nada
+        conn.execute(
+            "DELETE FROM imports WHERE status != ? AND claimed_at < ?",
+            (STATUS_PENDING, now - IMPORT_DUPLICATE_WINDOW_SECONDS),
+        )
+        row = conn.execute(
+            "SELECT * FROM imports WHERE server = ? AND content_hash = ?",
+            (server.upper(), content_hash),
+        ).fetchone()
+        if row:
+            if row["status"] == STATUS_PENDING:
+                blocking = now - row["claimed_at"] <= IMPORT_PENDING_TTL_SECONDS
+            else:
+                blocking = not force
+            if blocking:
+                return _row_to_dict(row)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO imports VALUES (?, ?, ?, NULL, ?, ?, NULL)",
+            (server.upper(), content_hash, STATUS_PENDING, mailling_name, now),
+        )
+    return None
+
+
+def release_import(server: str, content_hash: str, uncertain: bool = False):
+    """
+    Desfaz a reivindicação após uma falha: remove o registro (nova tentativa liberada)
+    ou, se o resultado é desconhecido (timeout), marca como incerto.
+    """
+    with transaction(IMPORT_INDEX_DB) as conn:
+        _ensure_schema(conn)
+        if uncertain:
+            conn.execute(
+                "UPDATE imports SET status = ?, claimed_at = ? WHERE server = ? AND content_hash = ?",
+                (STATUS_UNCERTAIN, time.time(), server.upper(), content_hash),
+            )
+        else:
+            conn.execute(
+                "DELETE FROM imports WHERE server = ? AND content_hash = ? AND status != ?",
+                (server.upper(), content_hash, STATUS_IMPORTED),
+            )
+
@@ -1,16 +1,17 @@
 # utils/login_manager.py (Versão FINAL DE DEPLOY)
 
 import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from playwright.async_api import Page, BrowserContext, Browser 
+from playwright.async_api import Page, BrowserContext, Browser, async_playwright
 from config.settings import (
-    LOGIN_URL_MG, 
-    LOGIN_URL_SP, 
-    BASE_URL_MG, 
-    BASE_URL_SP,
-    FILA_NOME_MG, 
-    FILA_NOME_SP # <-- HEADLESS_MODE foi removido desta lista
+    SESSION_STATE_DIR,
+    SESSION_STATE_TTL_SECONDS
 )
+from config.servers import get_server_config
 
 # Carrega as variáveis de ambiente (Credenciais e Headless)
 load_dotenv()
@@ -21,74 +22,307 @@ SENHA = os.getenv("DISCADOR_PASS")
 
 # HEADLESS_MODE é lido do .env ou Railway Secrets
 HEADLESS_MODE = os.getenv("HEADLESS_MODE", "False").lower() == "true"
+
+# Página leve usada para validar se a sessão do pool ainda está autenticada
+SESSION_CHECK_PAGE = "ch.php"
+SESSION_CHECK_TIMEOUT_MS = int(os.getenv("SESSION_CHECK_TIMEOUT_MS", "10000"))
 # --------------------------------------------------------
 
+# Seletor que só existe após o login (menu lateral do discador)
+SELETOR_MENU_AUTENTICADO = 'a[href="#Discador_AutomáticoCollapse"]'
+
 
 # --- Funções Auxiliares (AGORA USAM O PARÂMETRO 'server') ---
 def get_base_url(server: str) -> str:
-    """Retorna a URL base (MG ou SP) baseada no parâmetro 'server'."""
-    if server.upper() == "SP":
-        return BASE_URL_SP
-    return BASE_URL_MG
+    """Retorna a URL base do servidor (consulta ao registro de servidores)."""
+    return get_server_config(server)["base_url"]
 
 def get_login_url(server: str) -> str:
-    """Retorna a URL de login (MG ou SP) baseada no parâmetro 'server'."""
-    if server.upper() == "SP":
-        return LOGIN_URL_SP
-    return LOGIN_URL_MG
+    """Retorna a URL de login do servidor (consulta ao registro de servidores)."""
+    return get_server_config(server)["login_url"]
+
+def get_page_url(server: str, page_name: str) -> str:
+    """Retorna a URL de uma página do sistema (ex: ch.php) com o mesmo protocolo do login."""
+    return get_login_url(server).replace('pages/login.php', f'pages/{page_name}')
 
 def get_fila_name(server: str) -> str:
-    """Retorna o nome da Fila de Atendimento (MG ou SP) baseado no parâmetro 'server'."""
-    if server.upper() == "SP":
-        return FILA_NOME_SP
-    return FILA_NOME_MG
+    """Retorna o nome da Fila de Atendimento do servidor (consulta ao registro de servidores)."""
+    return get_server_config(server)["fila"]
 
 def get_server_name(server: str) -> str:
     """Retorna o nome do servidor atual para logging."""
     return server.upper()
 
 
-async def create_context_and_login(playwright_instance, server: str) -> tuple[BrowserContext, Page, Browser] | tuple[None, None, None]:
+async def _login(page: Page, server: str) -> bool:
+    """Preenche o formulário de login na página informada e aguarda o menu autenticado."""
+    login_url = get_login_url(server)
+    server_name = get_server_name(server)
+
+    # Tolerância de 60s
+    await page.goto(login_url, timeout=60000)
+    print(f"[{server_name}] Navegando para: {login_url}")
+
+    await page.fill('input[name="login"]', USUARIO)
+    await page.fill('input[name="password"]', SENHA)
+
+    # Tolerância de 60s para o clique
+    await page.click('button:has-text("Vamos lá")', timeout=60000)
+
+    # Espera Pós-Login
+    await page.wait_for_selector(SELETOR_MENU_AUTENTICADO, state='visible', timeout=15000)
+
+    print(f"[{server_name}] ✅ Login realizado e página autenticada!")
+    return True
+
+
+# ====================================================================
+# [ESTADO DE SESSÃO PERSISTIDO EM DISCO]
+# ====================================================================
+# Cookies/localStorage de cada servidor são salvos após o login e restaurados
+# em contextos novos (ex: após um redeploy). A validade é controlada pelo mtime
+# do arquivo, renovado a cada health-check bem-sucedido.
+
+def _get_session_state_path(server: str) -> str:
+    return os.path.join(SESSION_STATE_DIR, f"{get_server_name(server)}.json")
+
+
+def load_session_state(server: str) -> dict | None:
+    """Retorna o estado salvo do servidor ({storage_state, home_url}) ou None se ausente/expirado."""
+    path = _get_session_state_path(server)
+    try:
+        if time.time() - os.path.getmtime(path) > SESSION_STATE_TTL_SECONDS:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+async def save_session_state(context: BrowserContext, server: str, home_url: str | None = None):
+    """Grava o storage_state do contexto em disco (escrita atômica)."""
+    path = _get_session_state_path(server)
+    try:
+        state = {
+            "saved_at": time.time(),
+            "home_url": home_url,
+            "storage_state": await context.storage_state(),
+        }
+        os.makedirs(SESSION_STATE_DIR, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+    except Exception as e:
+        print(f"[{get_server_name(server)}] ⚠️ Falha ao persistir a sessão em disco: {e}")
+
+
+def touch_session_state(server: str):
+    """Renova a validade do estado salvo (no máximo uma escrita de metadado por minuto)."""
+    path = _get_session_state_path(server)
+    try:
+        if time.time() - os.path.getmtime(path) > 60:
+            os.utime(path)
+    except OSError:
+        pass
+
+
+def clear_session_state(server: str):
+    """Remove o estado salvo (sessão rejeitada pelo servidor)."""
+    try:
+        os.remove(_get_session_state_path(server))
+    except OSError:
+        pass
+
+
+# ====================================================================
+# [POOL PERSISTENTE DE NAVEGADOR]
+# ====================================================================
+# Um único Chromium vive durante todo o processo. Cada servidor mantém um
+# BrowserContext autenticado que é reaproveitado entre os ciclos do scheduler;
+# o login só é refeito quando a checagem de sessão falha.
+
+_PLAYWRIGHT = None
+_BROWSER: Browser | None = None
+_SESSIONS: dict[str, tuple[BrowserContext, Page]] = {}
+_HOME_URLS: dict[str, str] = {}
+_SESSION_LOCKS: dict[str, asyncio.Lock] = {}
+_POOL_LOCK: asyncio.Lock | None = None
+
+
+def _get_pool_lock() -> asyncio.Lock:
+    global _POOL_LOCK
+    if _POOL_LOCK is None:
+        _POOL_LOCK = asyncio.Lock()
+    return _POOL_LOCK
+
+
+def _get_session_lock(server: str) -> asyncio.Lock:
+    key = get_server_name(server)
+    if key not in _SESSION_LOCKS:
+        _SESSION_LOCKS[key] = asyncio.Lock()
+    return _SESSION_LOCKS[key]
+
+
+async def _get_browser() -> Browser:
+    """Retorna o Chromium compartilhado, relançando-o se tiver caído."""
+    global _PLAYWRIGHT, _BROWSER
+    async with _get_pool_lock():
+        if _BROWSER is None or not _BROWSER.is_connected():
+            if _PLAYWRIGHT is None:
+                _PLAYWRIGHT = await async_playwright().start()
+            _BROWSER = await _PLAYWRIGHT.chromium.launch(headless=HEADLESS_MODE)
+            # Contextos do navegador anterior morreram junto com ele
+            _SESSIONS.clear()
+            print("🌐 Pool de navegador iniciado (Chromium persistente).")
+        return _BROWSER
+
+
+async def _is_session_alive(context: BrowserContext, page: Page, server: str) -> bool:
+    """
+    Health-check barato: faz um GET autenticado (sem renderizar) usando os cookies do contexto.
+    Sessão expirada = redirecionamento para login.php ou formulário de login na resposta.
+    """
+    if page.is_closed():
+        return False
+    try:
+        response = await context.request.get(get_page_url(server, SESSION_CHECK_PAGE),
+                                             timeout=SESSION_CHECK_TIMEOUT_MS)
+        if not response.ok or 'login.php' in response.url:
+            return False
+        body = await response.text()
+        return 'name="login"' not in body
+    except Exception:
+        return False
+
+
+async def _discard_session(server: str):
+    """Fecha e remove o contexto do servidor do pool (sem adquirir o lock)."""
+    session = _SESSIONS.pop(get_server_name(server), None)
+    if session:
+        try:
+            await session[0].close()
+        except Exception:
+            pass
+
+
+async def acquire_session(server: str) -> tuple[BrowserContext, Page] | tuple[None, None]:
     """
-    Cria o contexto do navegador, realiza o login e retorna (context, page, browser).
-    Aplica tolerância de 60 segundos nas ações de rede críticas.
+    Entrega o contexto autenticado do servidor, validando a sessão antes.
+    Reaproveita o contexto vivo; refaz o login apenas se a sessão expirou.
     """
-    login_url = get_login_url(server) 
     server_name = get_server_name(server)
-    browser = None 
 
     if not USUARIO or not SENHA:
         print(f"[{server_name}] ❌ Credenciais não configuradas. Configure DISCADOR_USER/PASS no .env ou Railway Secrets.")
-        return None, None, None
+        return None, None
 
+    session = _SESSIONS.get(server_name)
+    if session and await _is_session_alive(*session, server):
+        touch_session_state(server)
+        return session
+
+    context = None
     try:
-        # 1. Cria o Navegador (Usando HEADLESS_MODE)
-        browser = await playwright_instance.chromium.launch(headless=HEADLESS_MODE)
-        context = await browser.new_context(ignore_https_errors=True) 
-        page = await context.new_page()
-
-        # 2. Navega para a URL de Login
-        # Tolerância de 60s
-        await page.goto(login_url, timeout=60000) 
-        print(f"[{server_name}] Navegando para: {login_url}")
-
-        # 3. Realiza o Login
-        await page.fill('input[name="login"]', USUARIO) 
-        await page.fill('input[name="password"]', SENHA)
-        
-        # Tolerância de 60s para o clique
-        await page.click('button:has-text("Vamos lá")', timeout=60000) 
-        
-        # 4. Espera Pós-Login
-        await page.wait_for_selector('a[href="#Discador_AutomáticoCollapse"]', state='visible', timeout=15000)
-        
-        print(f"[{server_name}] ✅ Login realizado e página autenticada!")
-        return context, page, browser 
+        if session and not session[1].is_closed():
+            # Contexto ainda vivo, mas a sessão expirou: re-login na mesma página
+            print(f"[{server_name}] 🔄 Sessão expirada. Refazendo login no contexto existente...")
+            context, page = session
+        else:
+            await _discard_session(server)
+            browser = await _get_browser()
+
+            # Tenta restaurar a sessão salva em disco antes de logar de novo
+            saved_state = load_session_state(server)
+            if saved_state:
+                context = await browser.new_context(ignore_https_errors=True,
+                                                    storage_state=saved_state["storage_state"])
+                page = await context.new_page()
+                if await _is_session_alive(context, page, server):
+                    print(f"[{server_name}] ♻️ Sessão restaurada do disco (sem novo login).")
+                    _SESSIONS[server_name] = (context, page)
+                    if saved_state.get("home_url"):
+                        _HOME_URLS[server_name] = saved_state["home_url"]
+                    touch_session_state(server)
+                    return context, page
+
+                print(f"[{server_name}] 🔄 Sessão salva rejeitada pelo servidor. Refazendo login...")
+                clear_session_state(server)
+            else:
+                context = await browser.new_context(ignore_https_errors=True)
+                page = await context.new_page()
+
+        await _login(page, server)
+        _SESSIONS[server_name] = (context, page)
+        _HOME_URLS[server_name] = page.url
+        await save_session_state(context, server, home_url=page.url)
+        return context, page
 
     except Exception as e:
         print(f"[{server_name}] ❌ Erro durante o processo de login ou inicialização: {e}")
-        if 'browser' in locals() and browser:
-            await browser.close()
-        return None, None, None
+        await _discard_session(server)
+        if context:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        return None, None
+
+
+async def get_session_cookies(server: str) -> list[dict] | None:
+    """
+    Cookies autenticados do servidor para clientes HTTP sem navegador.
+    Prioriza o contexto vivo do pool; se não houver, usa o estado salvo em disco.
+    """
+    session = _SESSIONS.get(get_server_name(server))
+    if session and not session[1].is_closed():
+        try:
+            return await session[0].cookies()
+        except Exception:
+            pass
+    saved_state = load_session_state(server)
+    if saved_state:
+        return saved_state["storage_state"].get("cookies") or None
+    return None
+
+
+@asynccontextmanager
+async def server_session(server: str):
+    """
+    Uso exclusivo do contexto autenticado do servidor (um worker por vez por servidor).
+    Yields (context, page) ou (None, None) se o login falhar.
+    """
+    async with _get_session_lock(server):
+        context, page = await acquire_session(server)
+        try:
+            yield context, page
+        except BaseException:
+            # Estado da página desconhecido após erro não tratado ou cancelamento (timeout do
+            # worker no meio da navegação): força contexto novo. O pop do pool é síncrono e o
+            # shield deixa o fechamento terminar mesmo se o cancelamento se repetir.
+            await asyncio.shield(_discard_session(server))
+            raise
+
+
+async def open_home_page(page: Page, server: str):
+    """Volta a página do pool para a home autenticada (onde fica o menu lateral)."""
+    home_url = _HOME_URLS.get(get_server_name(server))
+    if home_url and page.url != home_url:
+        await page.goto(home_url, wait_until='domcontentloaded', timeout=40000)
+    await page.wait_for_selector(SELETOR_MENU_AUTENTICADO, state='visible', timeout=15000)
 
 
+async def close_browser_pool():
+    """Encerra todos os contextos, o Chromium e o Playwright (shutdown do processo)."""
+    global _PLAYWRIGHT, _BROWSER
+    for server in list(_SESSIONS.keys()):
+        await _discard_session(server)
+    if _BROWSER:
+        try:
+            await _BROWSER.close()
+        except Exception:
+            pass
+        _BROWSER = None
+    if _PLAYWRIGHT:
+        await _PLAYWRIGHT.stop()
+        _PLAYWRIGHT = None
@@ -1,26 +1,37 @@
 # utils/mailing_api.py (VERSÃO FINAL COM BASE64, MÉTRICAS E LIMPEZA DE CÓDIGO)
 
 import httpx
+import numpy as np
 import pandas as pd
 import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+import multiprocessing
 import datetime
 import json
+import hashlib
 from dotenv import load_dotenv
 import base64
-from io import StringIO
+import io
+from typing import Iterator
 from datetime import datetime as dt  # Alias para evitar conflito com datetime
+from config.servers import get_server_config
+from config.settings import UPLOAD_TIMEOUT_SECONDS, METRICS_CACHE_TTL_SECONDS, METRICS_STALE_MAX_AGE_SECONDS
+from utils.http_pool import get_http_client
+from utils.import_index import (
+    get_imported_part, record_imported_part, claim_import, release_import, part_key, forget_import_parts,
+    STATUS_IMPORTED, STATUS_UNCERTAIN
+)
+from utils.mailing_filter import MailingFilter, MAILING_FILTER_ENABLED, normalize_phones, record_dialed_numbers
 
 # Carrega variáveis de ambiente (necessário para os.getenv)
 load_dotenv()
 
 # --- CONSTANTES GLOBAIS ---
-# Em produção, estas viriam de config/settings.py
-BASE_URL_MG = os.getenv("BASE_URL_MG", "http://186.194.50.155")
-BASE_URL_SP = os.getenv("BASE_URL_SP", "https://186.194.50.149")
+# URLs, filas e saídas de cada servidor vêm do registro único (config/servers.json)
 API_TOKEN = os.getenv("API_TOKEN")
-SAIDAS_VALOR = os.getenv("SAIDAS_VALOR", "70")
-FILA_NOME_MG = os.getenv("FILA_NOME_MG", "DISCADOR_MG")
-FILA_NOME_SP = os.getenv("FILA_NOME_SP", "DISCADOR_SP")
 
 if not API_TOKEN:
     print("ATENÇÃO: API_TOKEN não encontrado. As chamadas API falharão.")
@@ -30,10 +41,7 @@ if not API_TOKEN:
 
 def get_base_url_for_api(server: str) -> str:
     """Retorna a URL base correta: http://IP/api/ (O caminho validado)."""
-    if server.upper() == "SP":
-        base = BASE_URL_SP
-    else:
-        base = BASE_URL_MG
+    base = get_server_config(server)["base_url"]
     return f"{base.rstrip('/')}/api/"
 # Garante que o Dash e os Workers sempre chamem o endpoint validado, evitando erros 404.
 
@@ -43,9 +51,7 @@ def get_base_url_for_api(server: str) -> str:
 
 def get_fila_name(server: str) -> str:
     """Retorna o nome da fila correto para a construção do CSV."""
-    if server.upper() == "SP":
-        return FILA_NOME_SP
-    return FILA_NOME_MG
+    return get_server_config(server)["fila"]
 
 
 def extract_metrics(status_data, server_name):
@@ -65,8 +71,9 @@ def extract_metrics(status_data, server_name):
 def _generate_metadata_line(campaign_id: str, mailling_name: str, server: str, login_crm: str = "AUTOMACAO") -> str:
     """Cria a primeira linha de metadados (15 colunas) para o CSV."""
     fila_nome = get_fila_name(server)
+    saidas = get_server_config(server)["saidas"]
     metadata = [
-        campaign_id, mailling_name, SAIDAS_VALOR, fila_nome,
+        campaign_id, mailling_name, saidas, fila_nome,
         dt.now().strftime('%Y-%m-%d %H:%M:%S'), login_crm,
         dt.now().strftime('%Y-%m-%d'), "2025-12-31", "08:00:00", "20:00:00",
         "1", "simultanea", "1,2,3,4,5", "", ""
@@ -78,57 +85,219 @@ def _generate_metadata_line(campaign_id: str, mailling_name: str, server: str, l
 # [TRANSFORMAÇÃO - BASE64]
 # ====================================================================
 
-def _transform_client_data(file_content_base64: str, campaign_id: str, mailling_name: str, server: str,
-                           login_crm: str) -> str:
-    """
-    Recebe o conteúdo em Base64, decodifica, processa com Pandas, e salva o arquivo temporário.
-    """
-    try:
-        # 1. DECODIFICAR O CONTEÚDO (STRING BASE64 -> BYTES -> STRING)
-        decoded_bytes = base64.b64decode(file_content_base64)
-        decoded_content = decoded_bytes.decode('latin-1')
+# --- POSIÇÕES FIXAS DAS SUAS COLUNAS NO CSV ---
+POS_NUMERO = 29
+POS_NOME = 0
+POS_CPF = 1
+POS_LIVRE1 = 2
+POS_CHAVE = 3
+SOURCE_COLUMNS = [POS_NOME, POS_CPF, POS_LIVRE1, POS_CHAVE, POS_NUMERO]  # Únicas colunas lidas (de ~30)
+TARGET_COLUMN_COUNT = 13
 
-    except Exception as e:
-        raise Exception(f"Falha na decodificação do arquivo: {e}")
+# Nome do arquivo no campo multipart 'import' (o mesmo enviado desde a versão com arquivo temporário)
+UPLOAD_FILENAME = "temp_api_upload.csv"
 
-    # --- POSIÇÕES FIXAS DAS SUAS COLUNAS NO CSV ---
-    POS_NUMERO = 29;
-    POS_NOME = 0;
-    POS_CPF = 1;
-    POS_LIVRE1 = 2;
-    POS_CHAVE = 3
+# Linhas por bloco na leitura em streaming (memória constante, independe do tamanho do mailing)
+TRANSFORM_CHUNK_ROWS = int(os.getenv("TRANSFORM_CHUNK_ROWS", "50000"))
 
-    try:
-        # 2. LER O CONTEÚDO COM O PANDAS DIRETAMENTE DA MEMÓRIA
-        df_source = pd.read_csv(StringIO(decoded_content), sep=';', header=None, engine='python')
-    except Exception as e:
-        raise Exception(f"Falha na leitura do CSV de origem pelo Pandas: {e}")
+# Processos da transformação multi-core (0/1 = single-core em streaming)
+TRANSFORM_PARALLEL_WORKERS = int(os.getenv("TRANSFORM_PARALLEL_WORKERS", "0"))
 
-    # 3. TRANSFORMAÇÃO DE COLUNAS
-    df_target = pd.DataFrame()
-    df_target[0] = df_source[POS_NUMERO].astype(str)
-    df_target[1] = ""
-    df_target[2] = df_source[POS_NOME]
-    df_target[3] = df_source[POS_CPF].astype(str)
-    df_target[4] = df_source[POS_LIVRE1].fillna('')
-    df_target[5] = df_source[POS_CHAVE].fillna('')
-    for i in range(6, 13): df_target[i] = ""
+# Linhas por lista na importação em partes (0 = um único POST, como antes)
+IMPORT_MAX_ROWS_PER_PART = int(os.getenv("IMPORT_MAX_ROWS_PER_PART", "0"))
 
-    # 4. GERAÇÃO E SALVAMENTO DO ARQUIVO TEMPORÁRIO
-    metadata_line = _generate_metadata_line(campaign_id, mailling_name, server, login_crm)
-    temp_target_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp_api_upload.csv")
 
-    with open(temp_target_path, 'w', encoding='latin-1') as f:
-        f.write(metadata_line + "\n")
-    df_target.iloc[1:].to_csv(temp_target_path, mode='a', sep=';', header=False, index=False, encoding='latin-1')
-    return temp_target_path
-# CRÍTICA. Recebe a string Base64 do Dash, decodifica para CSV, usa Pandas para mapear
-# as colunas (30 ➡️ 13) e salva o resultado como um arquivo temporário no servidor.
+class _Base64Reader(io.RawIOBase):
+    """Leitor binário que decodifica a string Base64 do upload sob demanda, bloco a bloco."""
+
+    BLOCK_CHARS = 4 * 256 * 1024  # Múltiplo de 4 (fronteira válida de Base64)
+
+    def __init__(self, content_base64: str):
+        self._content = content_base64
+        self._position = 0
+        self._buffer = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        if not self._buffer:
+            if self._position >= len(self._content):
+                return 0
+            block = self._content[self._position:self._position + self.BLOCK_CHARS]
+            self._position += self.BLOCK_CHARS
+            self._buffer = memoryview(base64.b64decode(block))
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _open_source_stream(file_content_base64: str | None = None, source_csv_path: str | None = None):
+    """Abre a origem do mailing como stream binário: arquivo local (worker) ou Base64 (Dash)."""
+    if source_csv_path:
+        return open(source_csv_path, 'rb')
+    return io.BufferedReader(_Base64Reader(file_content_base64))
+
+
+def _transform_chunk(df_source: pd.DataFrame, normalize_phone_column: bool = False) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Mapeia um bloco de origem (5 colunas lidas) para as 13 colunas do layout de importação.
+    Retorna também os telefones normalizados como int64 (0 = inválido) para o filtro.
+    O telefone só é reescrito normalizado com normalize_phone_column (filtro ligado).
+    """
+    phones_text, phone_numbers = normalize_phones(df_source[POS_NUMERO])
+    empty = ""
+    df_target = pd.DataFrame({
+        0: phones_text if normalize_phone_column else df_source[POS_NUMERO],
+        1: empty,
+        2: df_source[POS_NOME],
+        3: df_source[POS_CPF],
+        4: df_source[POS_LIVRE1],
+        5: df_source[POS_CHAVE],
+        **{i: empty for i in range(6, TARGET_COLUMN_COUNT)}
+    })
+    return df_target, phone_numbers
+
+
+def _iter_transformed_chunks(source_stream, skip_header: bool = True,
+                             normalize_phone_column: bool = False) -> Iterator[tuple[np.ndarray, bytes]]:
+    """
+    Lê o CSV de origem em blocos com o parser C (apenas SOURCE_COLUMNS, tudo como texto)
+    e devolve cada bloco já serializado no layout de 13 colunas (latin-1), junto dos telefones.
+    """
+    reader = pd.read_csv(
+        source_stream, sep=';', header=None, encoding='latin-1', engine='c',
+        usecols=SOURCE_COLUMNS, dtype=str, keep_default_na=False,
+        skiprows=1 if skip_header else 0,  # Primeira linha do arquivo de origem é o cabeçalho
+        chunksize=TRANSFORM_CHUNK_ROWS
+    )
+    for df_source in reader:
+        df_target, phone_numbers = _transform_chunk(df_source, normalize_phone_column)
+        yield phone_numbers, df_target.to_csv(sep=';', header=False, index=False, lineterminator='\n').encode('latin-1')
+
+
+# --- TRANSFORMAÇÃO MULTI-CORE (MAILINGS MUITO GRANDES) ---
+# O arquivo é dividido em faixas de bytes alinhadas em quebras de linha; cada faixa
+# é transformada em um processo do pool e os resultados são remontados em ordem.
+# (O CSV de origem não tem campos com quebra de linha entre aspas.)
+_TRANSFORM_POOL = None
+_TRANSFORM_POOL_WORKERS = 0
+
+
+def _get_transform_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """Pool de processos reaproveitado entre importações (spawn: seguro com os threads do Dash/loop)."""
+    global _TRANSFORM_POOL, _TRANSFORM_POOL_WORKERS
+    if _TRANSFORM_POOL is None or _TRANSFORM_POOL_WORKERS != workers:
+        if _TRANSFORM_POOL is not None:
+            _TRANSFORM_POOL.shutdown(wait=False)
+        _TRANSFORM_POOL = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        _TRANSFORM_POOL_WORKERS = workers
+    return _TRANSFORM_POOL
+
+
+def _compute_line_ranges(source, size: int, parts: int) -> list[tuple[int, int]]:
+    """Divide [0, size) em até 'parts' faixas que começam sempre no início de uma linha."""
+    bounds = [0]
+    for i in range(1, parts):
+        position = size * i // parts
+        if position <= bounds[-1]:
+            continue
+        if isinstance(source, (bytes, bytearray)):
+            newline = source.find(b"\n", position)
+        else:
+            source.seek(position)
+            source.readline()
+            newline = source.tell() - 1
+        if newline < 0 or newline + 1 >= size:
+            break
+        if newline + 1 > bounds[-1]:
+            bounds.append(newline + 1)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _transform_byte_range(source_csv_path: str | None, segment: bytes | None, start: int, end: int,
+                          skip_header: bool, normalize_phone_column: bool = False) -> tuple[np.ndarray, bytes]:
+    """Executado no processo filho: transforma uma faixa de bytes e devolve (telefones, resultado serializado)."""
+    if segment is None:
+        with open(source_csv_path, 'rb') as f:
+            f.seek(start)
+            segment = f.read(end - start)
+    if not segment.strip():
+        return np.empty(0, dtype=np.int64), b""
+    chunks = list(_iter_transformed_chunks(io.BytesIO(segment), skip_header=skip_header,
+                                           normalize_phone_column=normalize_phone_column))
+    if not chunks:
+        return np.empty(0, dtype=np.int64), b""
+    return np.concatenate([numbers for numbers, _ in chunks]), b"".join(chunk for _, chunk in chunks)
+
+
+def _write_filtered_chunk(sink, phone_numbers: np.ndarray, chunk_bytes: bytes,
+                          mailing_filter: MailingFilter | None, content_hash) -> None:
+    """Acumula o bloco no hash do conteúdo (antes do filtro) e escreve a parte que sobrou do filtro."""
+    if content_hash is not None:
+        content_hash.update(chunk_bytes)
+    sink.write(mailing_filter.apply(phone_numbers, chunk_bytes) if mailing_filter else chunk_bytes)
+
+
+def _write_transformed_parallel(payload, file_content_base64: str | None, source_csv_path: str | None,
+                                workers: int, mailing_filter: MailingFilter | None = None, content_hash=None):
+    """Transforma a origem em 'workers' processos e escreve os blocos no payload na ordem original."""
+    if source_csv_path:
+        data = None
+        size = os.path.getsize(source_csv_path)
+        with open(source_csv_path, 'rb') as f:
+            ranges = _compute_line_ranges(f, size, workers)
+    else:
+        data = base64.b64decode(file_content_base64)
+        size = len(data)
+        ranges = _compute_line_ranges(data, size, workers)
+
+    pool = _get_transform_pool(workers)
+    futures = [
+        pool.submit(_transform_byte_range, source_csv_path, None if data is None else data[start:end],
+                    start, end, index == 0, mailing_filter is not None)
+        for index, (start, end) in enumerate(ranges)
+    ]
+    # Remontagem ordenada: a ordem das faixas é a ordem das linhas no arquivo
+    # (o filtro roda aqui, no processo pai, para deduplicar entre faixas)
+    for future in futures:
+        phone_numbers, chunk_bytes = future.result()
+        _write_filtered_chunk(payload, phone_numbers, chunk_bytes, mailing_filter, content_hash)
 
-# Recebe a string Base64 do navegador, eliminando a necessidade de ler o arquivo do disco rígido local.
 
+def _write_transformed_rows(sink, file_content_base64: str | None, source_csv_path: str | None,
+                            parallel_workers: int = 0, mailing_filter: MailingFilter | None = None,
+                            content_hash=None):
+    """
+    Escreve no sink binário as linhas transformadas (sem a linha de metadados).
+    Com mailing_filter, cada bloco passa pela deduplicação/não-perturbe antes de ser escrito.
+    Com content_hash (objeto hashlib), as linhas transformadas antes do filtro são acumuladas nele.
+    """
+    if parallel_workers > 1:
+        try:
+            _write_transformed_parallel(sink, file_content_base64, source_csv_path, parallel_workers,
+                                        mailing_filter, content_hash)
+        except Exception as e:
+            raise Exception(f"Falha na transformação paralela do CSV de origem: {e}")
+        return
 
+    try:
+        # 1. ABRE A ORIGEM COMO STREAM (Base64 decodificado sob demanda, sem cópia integral)
+        source_stream = _open_source_stream(file_content_base64, source_csv_path)
+    except Exception as e:
+        raise Exception(f"Falha na decodificação do arquivo: {e}")
 
+    try:
+        with source_stream:
+            for phone_numbers, chunk_bytes in _iter_transformed_chunks(
+                    source_stream, normalize_phone_column=mailing_filter is not None):
+                _write_filtered_chunk(sink, phone_numbers, chunk_bytes, mailing_filter, content_hash)
+    except Exception as e:
+        raise Exception(f"Falha na leitura do CSV de origem pelo Pandas: {e}")
 
 
 # ====================================================================
@@ -140,10 +309,10 @@ async def api_list_campaigns(server: str):
     """Lista todas as campanhas ativas."""
     url = f"{get_base_url_for_api(server)}list_campaign.php"
     data = {'token': API_TOKEN}
-    async with httpx.AsyncClient(timeout=20.0, verify=False) as client:
-        response = await client.post(url, data=data)
-        response.raise_for_status()
-        return response.json()
+    client = get_http_client(server)  # Conexão keep-alive reaproveitada (sem novo handshake)
+    response = await client.post(url, data=data)
+    response.raise_for_status()
+    return response.json()
 # API Call 1. Lista as campanhas ativas para encontrar o ID da Campanha que está rodando.
 # É o primeiro passo para saber o nome da campanha ativa.
 
@@ -155,88 +324,322 @@ async def api_get_campaign_status(server: str, campaign_id: str):
     """Obtém status detalhado de uma campanha (necessário para progresso)."""
     url = f"{get_base_url_for_api(server)}campaign_exec.php"
     params = {'id': campaign_id, 'token': API_TOKEN}
-    async with httpx.AsyncClient(timeout=20.0, verify=False) as client:
-        response = await client.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+    client = get_http_client(server)
+    response = await client.get(url, params=params)
+    response.raise_for_status()
+    return response.json()
 # API Call 2. Usa o ID para obter o status detalhado (Progresso/Saídas).
 # Fornece os números de performance brutos para o Dash.
 
 
+async def _fetch_active_campaign_metrics(server: str) -> dict:
+    """
+    Busca direta (sem cache) de Nome, Progresso e Saídas da campanha ativa.
+    Propaga exceções de rede/API para o cache decidir entre stale e erro.
+    """
+    campaigns = await api_list_campaigns(server)
+
+    # 1. Checa se há campanhas ativas
+    if not campaigns or not campaigns[0].get('id'):
+        return {"nome": "Nenhuma Campanha Ativa", "progresso": "0%", "saidas": "0", "id": None}
+
+    active_campaign = campaigns[0]
+    campaign_id = active_campaign.get('id')
+
+    # 2. Obtém o progresso detalhado
+    status_data = await api_get_campaign_status(server, campaign_id)
+    metrics = extract_metrics(status_data, server)
+
+    return {
+        "nome": active_campaign.get('nome', 'N/A'),
+        "progresso": metrics['progresso'],
+        "saidas": metrics['saidas'],
+        "id": campaign_id
+    }
+
+
+# --- CACHE DE MÉTRICAS (TTL + SINGLE-FLIGHT + STALE-WHILE-REVALIDATE) ---
+# Compartilhado entre threads/event loops do Dash: o "in-flight" é um
+# concurrent.futures.Future, que qualquer loop consegue aguardar.
+_METRICS_CACHE: dict[str, tuple[float, dict]] = {}      # Último resultado (inclusive erro), por TTL
+_METRICS_LAST_GOOD: dict[str, tuple[float, dict]] = {}  # Último resultado bem-sucedido (stale)
+_METRICS_INFLIGHT: dict[str, concurrent.futures.Future] = {}
+_METRICS_LOCK = threading.Lock()
+
+
 async def get_active_campaign_metrics(server: str) -> dict:
     """
     Função Master: Obtém todos os dados necessários (Nome, Progresso, Saídas)
     para um servidor em uma única chamada master.
+    Resultados valem por METRICS_CACHE_TTL_SECONDS; chamadas simultâneas aguardam
+    a mesma busca em andamento; em erro, devolve o último valor bom marcado como 'stale'.
     """
+    key = server.upper()
+    with _METRICS_LOCK:
+        cached = _METRICS_CACHE.get(key)
+        if cached and time.monotonic() - cached[0] < METRICS_CACHE_TTL_SECONDS:
+            return dict(cached[1])
+        inflight = _METRICS_INFLIGHT.get(key)
+        if inflight is None:
+            inflight = concurrent.futures.Future()
+            # RUNNING: o cancelamento de quem aguarda não cancela a busca compartilhada
+            inflight.set_running_or_notify_cancel()
+            _METRICS_INFLIGHT[key] = inflight
+            is_owner = True
+        else:
+            is_owner = False
+
+    if not is_owner:
+        try:
+            return dict(await asyncio.shield(asyncio.wrap_future(inflight)))
+        except Exception:
+            return {"nome": "ERRO API", "progresso": "N/A", "saidas": "N/A", "id": None}
+
     try:
-        campaigns = await api_list_campaigns(server)
+        try:
+            result = await _fetch_active_campaign_metrics(server)
+            with _METRICS_LOCK:
+                _METRICS_LAST_GOOD[key] = (time.monotonic(), result)
+
+        except Exception as e:
+            with _METRICS_LOCK:
+                last_good = _METRICS_LAST_GOOD.get(key)
+            if last_good and time.monotonic() - last_good[0] < METRICS_STALE_MAX_AGE_SECONDS:
+                # Stale-while-revalidate: mantém o último dado bom no painel
+                result = {**last_good[1], "stale": True}
+            else:
+                # Retorna um erro amigável para o Dashboard
+                result = {"nome": "ERRO API", "progresso": "N/A", "saidas": "N/A", "id": None}
+
+        with _METRICS_LOCK:
+            _METRICS_CACHE[key] = (time.monotonic(), result)
+        if not inflight.done():
+            inflight.set_result(result)
+        return dict(result)
+
+    except BaseException as e:
+        # Cancelamento do dono: libera quem estava aguardando
+        if not inflight.done():
+            inflight.set_exception(e if isinstance(e, Exception) else RuntimeError("Busca de métricas cancelada"))
+        raise
 
-        # 1. Checa se há campanhas ativas
-        if not campaigns or not campaigns[0].get('id'):
-            return {"nome": "Nenhuma Campanha Ativa", "progresso": "0%", "saidas": "0", "id": None}
+    finally:
+        with _METRICS_LOCK:
+            _METRICS_INFLIGHT.pop(key, None)
+# Função Master. Combina o Call 1 e o Call 2, trata erros e retorna um dicionário limpo (nome, progresso, saídas) que o Dash pode usar diretamente.
+# O app.py chama esta função a cada 10 segundos para atualizar o painel.
 
-        active_campaign = campaigns[0]
-        campaign_id = active_campaign.get('id')
 
-        # 2. Obtém o progresso detalhado
-        status_data = await api_get_campaign_status(server, campaign_id)
-        metrics = extract_metrics(status_data, server)
 
-        return {
-            "nome": active_campaign.get('nome', 'N/A'),
-            "progresso": metrics['progresso'],
-            "saidas": metrics['saidas'],
-            "id": campaign_id
-        }
 
-    except Exception as e:
-        # Retorna um erro amigável para o Dashboard
-        return {"nome": "ERRO API", "progresso": "N/A", "saidas": "N/A", "id": None}
-# Função Master. Combina o Call 1 e o Call 2, trata erros e retorna um dicionário limpo (nome, progresso, saídas) que o Dash pode usar diretamente.
-# O app.py chama esta função a cada 10 segundos para atualizar o painel.
 
+# --- API CALL 3: IMPORTAÇÃO DE MAILING (MULTIPART POST) ---
+async def _post_mailling_payload(server: str, payload: io.BytesIO) -> dict:
+    """Envia um payload (metadados + linhas) para o import_mailling.php e devolve o JSON da API."""
+    url = f"{get_base_url_for_api(server)}import_mailling.php"
+
+    with payload:
+        files = {'import': (UPLOAD_FILENAME, payload, 'text/csv')}
+        data = {'token': API_TOKEN, 'ok': 'ok'}
 
+        client = get_http_client(server)
+        response = await client.post(url, data=data, files=files, timeout=UPLOAD_TIMEOUT_SECONDS)
+        response.raise_for_status()
 
+    raw_response_text = response.text
+    try:
+        return response.json()
+    except json.JSONDecodeError:
+        raise Exception(f"RESPOSTA BRUTA DO SERVIDOR (Não é JSON): {raw_response_text[:1000]}...")
 
 
-# --- API CALL 3: IMPORTAÇÃO DE MAILING (MULTIPART POST) ---
-async def api_import_mailling_upload(server: str, campaign_id: str, file_content_base64: str, mailling_name: str,
-                                     login_crm: str):
+def _split_rows(rows: bytes, max_rows_per_part: int) -> list[bytes]:
+    """Divide as linhas transformadas em partes de no máximo max_rows_per_part linhas."""
+    newline_positions = np.flatnonzero(np.frombuffer(rows, dtype=np.uint8) == 10)
+    part_ends = [int(newline_positions[i]) + 1
+                 for i in range(max_rows_per_part - 1, len(newline_positions), max_rows_per_part)]
+    if not part_ends or part_ends[-1] < len(rows):
+        part_ends.append(len(rows))
+    part_starts = [0] + part_ends[:-1]
+    return [rows[start:end] for start, end in zip(part_starts, part_ends) if end > start]
+
+
+async def _import_mailling_in_parts(server: str, campaign_id: str, rows: bytes, mailling_name: str,
+                                    login_crm: str, max_rows_per_part: int, file_hash: str) -> dict:
     """
-    Recebe o conteúdo Base64 do Dash, transforma, e envia o arquivo Multipart para a API.
+    Envia o mailing como N listas de tamanho limitado, com concorrência limitada por servidor.
+    Partes já aceitas desta mesma importação (hash do arquivo + número da parte no índice)
+    não são reenviadas: uma nova chamada após falha retoma apenas as partes que faltaram.
     """
-    temp_file_path = None
+    parts = _split_rows(rows, max_rows_per_part)
+    total = len(parts)
+    semaphore = asyncio.Semaphore(get_server_config(server)["limits"]["upload_concurrency"])
 
-    try:
-        # 1. TRANSFORMAÇÃO E GERAÇÃO DO ARQUIVO TEMPORÁRIO (USANDO O CONTEÚDO BASE64)
-        temp_file_path = _transform_client_data(file_content_base64, campaign_id, mailling_name, server, login_crm)
+    async def upload_part(number: int, part_rows: bytes) -> dict:
+        part_name = f"{mailling_name} - P{number}/{total}"
+        content_hash = part_key(file_hash, number, total)
 
-        # 2. CONFIGURAÇÃO E ENVIO MULTIPART/FORM-DATA
-        url = f"{get_base_url_for_api(server)}import_mailling.php"
+        imported = await asyncio.to_thread(get_imported_part, server, content_hash)
+        if imported:
+            return {"parte": number, "success": True, "id_lista": imported["id_lista"], "retomada": True}
 
-        with open(temp_file_path, 'rb') as f:
-            files = {'import': ('temp_api_upload.csv', f, 'text/csv')}
-            data = {'token': API_TOKEN, 'ok': 'ok'}
+        async with semaphore:
+            try:
+                metadata_line = _generate_metadata_line(campaign_id, part_name, server, login_crm)
+                payload = io.BytesIO((metadata_line + "\n").encode('latin-1') + part_rows)
+                result = await _post_mailling_payload(server, payload)
+            except Exception as e:
+                # Timeout: a parte pode ter sido aceita sem que a resposta chegasse
+                return {"parte": number, "success": False, "erro": str(e),
+                        "incerto": isinstance(e, httpx.TimeoutException)}
+
+        if not isinstance(result, dict) or not result.get('success'):
+            return {"parte": number, "success": False, "erro": str(result)[:300]}
+
+        await asyncio.to_thread(record_imported_part, server, content_hash, result.get('id_lista'), part_name)
+        return {"parte": number, "success": True, "id_lista": result.get('id_lista'), "retomada": False}
+
+    part_results = await asyncio.gather(*(upload_part(n, p) for n, p in enumerate(parts, start=1)))
+    failed = [r["parte"] for r in part_results if not r["success"]]
+    id_listas = [r["id_lista"] for r in part_results if r["success"]]
+
+    return {
+        "success": not failed,
+        "id_lista": ",".join(str(i) for i in id_listas),
+        "id_listas": id_listas,
+        "partes": part_results,
+        "partes_com_falha": failed,
+        "erro": f"{len(failed)} de {total} partes falharam: {failed}" if failed else None,
+    }
+
+
+async def prepare_mailling_import(server: str, campaign_id: str, file_content_base64: str | None, mailling_name: str,
+                                  source_csv_path: str | None = None, parallel_workers: int | None = None,
+                                  filter_numbers: bool | None = None, force: bool = False) -> dict:
+    """
+    Transforma as linhas e reivindica o conteúdo no índice de importações, sem enviar nada.
+    Devolve {"result": ...} quando não há o que enviar (conteúdo repetido ou vazio após o filtro)
+    ou a importação preparada ({"result": None, ...}) para send_prepared_import.
+    Permite ao worker diário detectar a repetição ANTES de finalizar a campanha atual.
+    """
+    if parallel_workers is None:
+        parallel_workers = TRANSFORM_PARALLEL_WORKERS
+    if filter_numbers is None:
+        filter_numbers = MAILING_FILTER_ENABLED
+
+    mailing_filter = MailingFilter(server) if filter_numbers else None
+
+    # 1. TRANSFORMAÇÃO DAS LINHAS (fora do event loop: o scheduler e a bridge do Dash continuam respondendo)
+    # O hash cobre campanha + linhas transformadas, sem a linha de metadados (que tem data/hora)
+    content_hash = hashlib.sha256(f"{campaign_id};".encode())
+    rows_buffer = io.BytesIO()
+    await asyncio.to_thread(_write_transformed_rows, rows_buffer, file_content_base64, source_csv_path,
+                            parallel_workers, mailing_filter, content_hash)
+    rows = rows_buffer.getvalue()
+    file_hash = content_hash.hexdigest()
+
+    # 2. IDEMPOTÊNCIA: reivindica o conteúdo no índice compartilhado (scheduler x painel)
+    existing = await asyncio.to_thread(claim_import, server, file_hash, mailling_name, force)
+    if existing:
+        return {"result": _duplicate_import_result(server, existing)}
+
+    if mailing_filter:
+        dropped = mailing_filter.stats["linhas_recebidas"] - mailing_filter.stats["linhas_enviadas"]
+        if dropped:
+            print(f"[{server.upper()}] ⚠️ Filtro do mailing descartou {dropped} linhas: {mailing_filter.summary()}")
+        else:
+            print(f"[{server.upper()}] 🧹 Filtro do mailing: {mailing_filter.summary()}")
+        if not rows:
+            await asyncio.to_thread(release_import, server, file_hash)
+            return {"result": {"success": False, "erro": "Nenhuma linha restante após o filtro do mailing.",
+                               "filtro": mailing_filter.stats}}
+
+    return {"result": None, "campaign_id": campaign_id, "mailling_name": mailling_name, "rows": rows,
+            "file_hash": file_hash, "filter": mailing_filter}
+
+
+async def release_prepared_import(server: str, prepared: dict):
+    """Libera a reivindicação de uma importação preparada que não será enviada (ex: finalização falhou)."""
+    if prepared.get("result") is None:
+        await asyncio.to_thread(release_import, server, prepared["file_hash"])
+
+
+async def send_prepared_import(server: str, prepared: dict, login_crm: str,
+                               max_rows_per_part: int | None = None) -> dict:
+    """Envia uma importação preparada e grava o resultado no índice (importado, incerto ou liberado)."""
+    if prepared.get("result") is not None:
+        return prepared["result"]
+    if max_rows_per_part is None:
+        max_rows_per_part = IMPORT_MAX_ROWS_PER_PART
+
+    campaign_id, mailling_name = prepared["campaign_id"], prepared["mailling_name"]
+    rows, file_hash, mailing_filter = prepared["rows"], prepared["file_hash"], prepared["filter"]
+
+    # 3. ENVIO MULTIPART/FORM-DATA (em partes retomáveis ou em um único POST)
+    uncertain = False
+    try:
+        if max_rows_per_part > 0:
+            result = await _import_mailling_in_parts(server, campaign_id, rows, mailling_name, login_crm,
+                                                     max_rows_per_part, file_hash)
+            uncertain = any(part.get("incerto") for part in result["partes"])
+        else:
+            metadata_line = _generate_metadata_line(campaign_id, mailling_name, server, login_crm)
+            payload = io.BytesIO((metadata_line + "\n").encode('latin-1') + rows)
+            result = await _post_mailling_payload(server, payload)
+    except BaseException as e:
+        await asyncio.to_thread(release_import, server, file_hash, isinstance(e, httpx.TimeoutException))
+        raise
+
+    if isinstance(result, dict) and result.get('success'):
+        await asyncio.to_thread(record_imported_part, server, file_hash, result.get('id_lista'), mailling_name)
+        await asyncio.to_thread(forget_import_parts, server, file_hash)
+    else:
+        await asyncio.to_thread(release_import, server, file_hash, uncertain)
 
-            async with httpx.AsyncClient(timeout=120.0, verify=False) as client:
-                response = await client.post(url, data=data, files=files)
-                response.raise_for_status()
+    # 4. REGISTRA OS NÚMEROS ENVIADOS (base do filtro "importados recentemente")
+    if mailing_filter and isinstance(result, dict):
+        if result.get('success'):
+            await asyncio.to_thread(record_dialed_numbers, server, mailing_filter.kept_numbers())
+        result["filtro"] = mailing_filter.stats
+    return result
 
-            raw_response_text = response.text
-            try:
-                return response.json()
-            except json.JSONDecodeError:
-                raise Exception(f"RESPOSTA BRUTA DO SERVIDOR (Não é JSON): {raw_response_text[:1000]}...")
 
+async def api_import_mailling_upload(server: str, campaign_id: str, file_content_base64: str | None, mailling_name: str,
+                                     login_crm: str, source_csv_path: str | None = None,
+                                     parallel_workers: int | None = None, max_rows_per_part: int | None = None,
+                                     filter_numbers: bool | None = None, force: bool = False):
+    """
+    Recebe o conteúdo Base64 do Dash (ou o caminho do CSV local do worker diário),
+    transforma, e envia o arquivo Multipart para a API.
+    parallel_workers > 1 divide a transformação em processos (padrão: TRANSFORM_PARALLEL_WORKERS).
+    max_rows_per_part > 0 envia em várias listas retomáveis (padrão: IMPORT_MAX_ROWS_PER_PART).
+    filter_numbers normaliza o telefone e descarta inválidos/duplicados/não-perturbe/importados
+    recentemente (padrão: MAILING_FILTER_ENABLED, desligado).
+    Conteúdo idêntico (mesma campanha e mesmas linhas transformadas) já importado dentro da
+    janela de repetição ou em importação não é reenviado; force=True ignora importações anteriores.
+    """
+    try:
+        prepared = await prepare_mailling_import(server, campaign_id, file_content_base64, mailling_name,
+                                                 source_csv_path, parallel_workers, filter_numbers, force)
+        return await send_prepared_import(server, prepared, login_crm, max_rows_per_part)
 
     except Exception as e:
         raise Exception(f"ERRO CRÍTICO NA REQUISIÇÃO HTTP: {e}")
 
-    finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
 
-# API Call 3. Recebe a Base64, chama _transform_client_data para obter o arquivo temporário,
-# e usa o httpx para enviar o Upload Multipart para o endpoint import_mailling.php.
+def _duplicate_import_result(server: str, existing: dict) -> dict:
+    """Resposta para um conteúdo repetido, sem reenviar o upload."""
+    server_name = server.upper()
+    if existing["status"] == STATUS_IMPORTED:
+        print(f"[{server_name}] ♻️ Mailing idêntico já importado em {existing['imported_at']} "
+              f"(ID Lista: {existing['id_lista']}). Upload ignorado.")
+        return {"success": True, "duplicate": True, "id_lista": existing["id_lista"],
+                "mailling_name": existing["mailling_name"], "importado_em": existing["imported_at"]}
 
-# É o endpoint que é disparado quando o usuário clica nos botões de Importação Manual.
+    if existing["status"] == STATUS_UNCERTAIN:
+        erro = ("Envio anterior idêntico terminou em timeout e pode ter criado a lista. "
+                "Confira no discador e, se necessário, reenvie com force=True.")
+    else:
+        erro = "Importação idêntica já em andamento."
+    print(f"[{server_name}] ⚠️ {erro}")
+    return {"success": False, "duplicate": True, "erro": erro}
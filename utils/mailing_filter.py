@@ -0,0 +1,187 @@
+# utils/mailing_filter.py (Normalização, Deduplicação e Filtro Não-Perturbe do Mailing)
+
+import os
+import time
+from itertools import compress
+import numpy as np
+import pandas as pd
+from config.settings import DATA_DIR
+
+# --- ARMAZENAMENTO COMPACTO EM DISCO ---
+# Telefones são guardados como int64 (8 bytes por número) em arquivos NumPy:
+#   dnc.npy                -> lista não-perturbe global (ordenada, sem repetição)
+#   recent_<SERVIDOR>.npz  -> números enviados recentemente (telefone + dia da importação)
+MAILING_FILTER_DIR = os.path.join(DATA_DIR, "dnc")
+DNC_FILE = os.path.join(MAILING_FILTER_DIR, "dnc.npy")
+# Origem da lista não-perturbe: texto com um telefone por linha (qualquer formato; num CSV
+# com ';' vale a primeira coluna). Basta substituir o arquivo no volume: a próxima
+# importação recompila o dnc.npy a partir dele.
+DNC_SOURCE_FILE = os.getenv("DNC_SOURCE_FILE", os.path.join(MAILING_FILTER_DIR, "nao_perturbe.txt"))
+RECENTLY_DIALED_DAYS = int(os.getenv("RECENTLY_DIALED_DAYS", "3"))
+# Opt-in: com o filtro ligado, o mailing enviado ao discador muda (telefone normalizado,
+# linhas inválidas/repetidas/não-perturbe e números importados nos últimos dias descartados)
+MAILING_FILTER_ENABLED = os.getenv("MAILING_FILTER_ENABLED", "false").lower() == "true"
+
+# Telefone brasileiro válido após normalização: DDD + 8 ou 9 dígitos
+MIN_PHONE_DIGITS = 10
+MAX_PHONE_DIGITS = 11
+
+
+def normalize_phones(raw_phones: pd.Series) -> tuple[pd.Series, np.ndarray]:
+    """
+    Normaliza os telefones de forma vetorizada (só dígitos, sem 0 de longa distância e sem +55).
+    Retorna (texto normalizado — original quando inválido, array int64 com 0 para inválidos).
+    """
+    digits = raw_phones.str.replace(r'\D', '', regex=True).str.lstrip('0')
+    with_country_code = (digits.str.len() > MAX_PHONE_DIGITS) & digits.str.startswith('55')
+    digits = digits.where(~with_country_code, digits.str[2:])
+
+    valid = digits.str.len().between(MIN_PHONE_DIGITS, MAX_PHONE_DIGITS)
+    numbers = pd.to_numeric(digits.where(valid, '0'), errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    return digits.where(valid, raw_phones), numbers
+
+
+def _sorted_contains(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Pertinência vetorizada em array ordenado (busca binária)."""
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_values, values)
+    positions[positions >= len(sorted_values)] = len(sorted_values) - 1
+    return sorted_values[positions] == values
+
+
+def _get_recent_file(server: str) -> str:
+    return os.path.join(MAILING_FILTER_DIR, f"recent_{server.upper()}.npz")
+
+
+def _today() -> int:
+    return int(time.time() // 86400)
+
+
+def _save_atomic(path: str, save_function, *args, **kwargs):
+    os.makedirs(MAILING_FILTER_DIR, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        save_function(f, *args, **kwargs)
+    os.replace(temp_path, path)
+
+
+def _sync_do_not_call_source():
+    """Recompila o dnc.npy quando o arquivo de origem é mais novo (o arquivo é a fonte da verdade)."""
+    try:
+        source_mtime = os.path.getmtime(DNC_SOURCE_FILE)
+    except OSError:
+        return
+    try:
+        if os.path.getmtime(DNC_FILE) >= source_mtime:
+            return
+    except OSError:
+        pass
+
+    try:
+        raw_phones = pd.read_csv(DNC_SOURCE_FILE, sep=';', header=None, usecols=[0], dtype=str,
+                                 encoding='latin-1', skip_blank_lines=True)[0].dropna()
+    except pd.errors.EmptyDataError:
+        raw_phones = pd.Series([], dtype=str)  # Arquivo esvaziado: lista não-perturbe vazia
+    _, numbers = normalize_phones(raw_phones)
+    # Linhas inválidas (cabeçalho, texto) viram 0 e ficam de fora
+    _save_atomic(DNC_FILE, np.save, np.unique(numbers[numbers > 0]))
+    print(f"🚫 Lista não-perturbe atualizada a partir de {DNC_SOURCE_FILE}.")
+
+
+def load_do_not_call() -> np.ndarray:
+    """Lista não-perturbe (int64 ordenado). Vazia se nenhum arquivo de origem foi fornecido."""
+    try:
+        _sync_do_not_call_source()
+    except Exception as e:
+        # Arquivo de origem ilegível: segue com a última lista compilada
+        print(f"⚠️ Falha ao ler a lista não-perturbe ({DNC_SOURCE_FILE}): {e}")
+    try:
+        return np.load(DNC_FILE)
+    except (OSError, ValueError):
+        return np.empty(0, dtype=np.int64)
+
+
+def _load_recent(server: str) -> tuple[np.ndarray, np.ndarray]:
+    try:
+        with np.load(_get_recent_file(server)) as data:
+            return data["phones"], data["days"]
+    except (OSError, ValueError, KeyError):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+
+def load_recently_dialed(server: str) -> np.ndarray:
+    """Telefones enviados ao servidor nos últimos RECENTLY_DIALED_DAYS dias (int64 ordenado)."""
+    phones, days = _load_recent(server)
+    return np.unique(phones[days > _today() - RECENTLY_DIALED_DAYS])
+
+
+def record_dialed_numbers(server: str, numbers: np.ndarray):
+    """Registra os telefones importados hoje e descarta os que saíram da janela."""
+    phones, days = _load_recent(server)
+    keep = days > _today() - RECENTLY_DIALED_DAYS
+    phones = np.concatenate([phones[keep], numbers.astype(np.int64)])
+    days = np.concatenate([days[keep], np.full(len(numbers), _today(), dtype=np.int32)])
+    _save_atomic(_get_recent_file(server), np.savez_compressed, phones=phones, days=days)
+
+
+class MailingFilter:
+    """
+    Etapa pré-importação aplicada bloco a bloco (em ordem): descarta telefones inválidos,
+    repetidos no próprio arquivo (índice hash), na lista não-perturbe ou já importados nos últimos RECENTLY_DIALED_DAYS dias.
+    """
+
+    def __init__(self, server: str):
+        self.server = server
+        self._do_not_call = load_do_not_call()
+        self._recently_dialed = load_recently_dialed(server)
+        self._seen: set[int] = set()
+        self._kept_numbers: list[np.ndarray] = []
+        self.stats = {
+            "linhas_recebidas": 0,
+            "invalidos": 0,
+            "duplicados": 0,
+            "nao_perturbe": 0,
+            "discados_recentemente": 0,
+            "linhas_enviadas": 0,
+        }
+
+    def apply(self, numbers: np.ndarray, chunk_bytes: bytes) -> bytes:
+        """Filtra um bloco serializado (uma linha por telefone, na mesma ordem de 'numbers')."""
+        total = len(numbers)
+        invalid = numbers <= 0
+        duplicated = pd.Series(numbers).duplicated().to_numpy() & ~invalid
+        if self._seen:
+            duplicated |= np.fromiter(map(self._seen.__contains__, numbers.tolist()), dtype=bool, count=total)
+        do_not_call = _sorted_contains(self._do_not_call, numbers) & ~invalid & ~duplicated
+        recent = _sorted_contains(self._recently_dialed, numbers) & ~invalid & ~duplicated & ~do_not_call
+        keep = ~(invalid | duplicated | do_not_call | recent)
+
+        kept_numbers = numbers[keep]
+        self._seen.update(kept_numbers.tolist())
+        self._kept_numbers.append(kept_numbers)
+        self.stats["linhas_recebidas"] += total
+        self.stats["invalidos"] += int(invalid.sum())
+        self.stats["duplicados"] += int(duplicated.sum())
+        self.stats["nao_perturbe"] += int(do_not_call.sum())
+        self.stats["discados_recentemente"] += int(recent.sum())
+        self.stats["linhas_enviadas"] += len(kept_numbers)
+
+        if keep.all():
+            return chunk_bytes
+        lines = chunk_bytes.split(b"\n")[:total]
+        kept_lines = list(compress(lines, keep.tolist()))
+        return b"\n".join(kept_lines) + b"\n" if kept_lines else b""
+
+    def kept_numbers(self) -> np.ndarray:
+        """Telefones efetivamente enviados (para registrar como discados após o sucesso)."""
+        if not self._kept_numbers:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(self._kept_numbers)
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"{s['linhas_recebidas']} recebidas, {s['linhas_enviadas']} enviadas | descartadas: "
+                f"{s['invalidos']} inválidas, {s['duplicados']} duplicadas, "
+                f"{s['nao_perturbe']} não-perturbe, {s['discados_recentemente']} importadas nos últimos "
+                f"{RECENTLY_DIALED_DAYS} dias")
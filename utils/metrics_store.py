@@ -0,0 +1,157 @@
+# utils/metrics_store.py (Série Temporal de Métricas do Monitor e das Campanhas)
+
+import os
+import time
+import threading
+from utils.db import transaction, reading
+
+# Amostras por servidor/métrica em SQLite (DATA_DIR/metrics.db), compartilhadas entre
+# o scheduler (chamadas ativas, restarts) e o painel (progresso, saídas):
+#   active_calls -> chamadas ativas lidas pelo monitor
+#   restart      -> 1 = restart com sucesso, 0 = restart com falha
+#   progresso    -> % de progresso da campanha ativa
+#   saidas       -> saídas configuradas na campanha ativa
+METRICS_DB = "metrics.db"
+
+# Escrita em lote: as amostras ficam em memória e vão para o disco a cada intervalo, em um
+# thread próprio (um banco travado não segura o loop do scheduler nem o da bridge do painel)
+METRICS_FLUSH_INTERVAL_SECONDS = int(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "30"))
+METRICS_BUFFER_MAX_SAMPLES = 5000  # Teto do buffer se o disco ficar indisponível
+METRICS_RETENTION_DAYS = int(os.getenv("METRICS_RETENTION_DAYS", "14"))
+METRICS_PRUNE_INTERVAL_SECONDS = 60 * 60
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS metric_samples (
+        server TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        ts REAL NOT NULL,
+        value REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_metric_samples ON metric_samples (server, metric, ts)",
+)
+
+_BUFFER: list[tuple[str, str, float, float]] = []
+_BUFFER_LOCK = threading.Lock()
+_FLUSH_LOCK = threading.Lock()  # Um flush por vez (thread de fundo x flush do encerramento)
+_FLUSH_THREAD: threading.Thread | None = None
+_LAST_FLUSH = time.monotonic()
+_LAST_PRUNE = 0.0
+_SCHEMA_READY = False
+
+
+def _ensure_schema(conn):
+    global _SCHEMA_READY
+    if not _SCHEMA_READY:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        _SCHEMA_READY = True
+
+
+def parse_metric_value(value) -> float | None:
+    """Converte valores do painel ("45%", "70", 12) em número. None para "N/A" e afins."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace('%', '').replace(',', '.').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def record_samples(server: str, values: dict, ts: float | None = None):
+    """
+    Acrescenta as métricas do ciclo ao buffer (valores não numéricos são ignorados)
+    e, quando o intervalo de flush venceu, dispara a gravação do lote em segundo plano.
+    Nunca espera pelo disco.
+    """
+    global _FLUSH_THREAD
+    ts = time.time() if ts is None else ts
+    with _BUFFER_LOCK:
+        for metric, value in values.items():
+            number = parse_metric_value(value)
+            if number is not None:
+                _BUFFER.append((server.upper(), metric, ts, number))
+        if len(_BUFFER) > METRICS_BUFFER_MAX_SAMPLES:
+            del _BUFFER[:len(_BUFFER) - METRICS_BUFFER_MAX_SAMPLES]
+        flush_due = (time.monotonic() - _LAST_FLUSH >= METRICS_FLUSH_INTERVAL_SECONDS
+                     and (_FLUSH_THREAD is None or not _FLUSH_THREAD.is_alive()))
+        if flush_due:
+            _FLUSH_THREAD = threading.Thread(target=flush_samples, name="metrics-flush", daemon=True)
+            _FLUSH_THREAD.start()
+
+
+def flush_samples():
+    """
+    Grava o buffer em uma transação e aplica a retenção (no máximo uma vez por hora).
+    Bloqueante: chamada direta só no encerramento; no ciclo normal roda no thread de flush.
+    """
+    with _FLUSH_LOCK:
+        _flush_buffer()
+
+
+def _flush_buffer():
+    global _LAST_FLUSH, _LAST_PRUNE
+    with _BUFFER_LOCK:
+        batch = list(_BUFFER)
+        _BUFFER.clear()
+        _LAST_FLUSH = time.monotonic()
+    if not batch:
+        return
+
+    try:
+        with transaction(METRICS_DB) as conn:
+            _ensure_schema(conn)
+            conn.executemany("INSERT INTO metric_samples VALUES (?, ?, ?, ?)", batch)
+            if time.monotonic() - _LAST_PRUNE >= METRICS_PRUNE_INTERVAL_SECONDS:
+                conn.execute("DELETE FROM metric_samples WHERE ts < ?",
+                             (time.time() - METRICS_RETENTION_DAYS * 86400,))
+                _LAST_PRUNE = time.monotonic()
+    except Exception as e:
+        # Devolve o lote ao buffer (limitado) para a próxima tentativa
+        print(f"⚠️ Falha ao gravar métricas ({len(batch)} amostras): {e}")
+        with _BUFFER_LOCK:
+            _BUFFER[:0] = batch
+            if len(_BUFFER) > METRICS_BUFFER_MAX_SAMPLES:
+                del _BUFFER[:len(_BUFFER) - METRICS_BUFFER_MAX_SAMPLES]
+
+
+def query_downsampled(server: str, metric: str, since_ts: float, until_ts: float | None = None,
+                      max_points: int = 300) -> dict[str, list]:
+    """
+    Série reduzida no próprio SQLite: o intervalo é dividido em até max_points baldes
+    e cada balde devolve início, média, mínimo e máximo. Uma semana inteira volta em
+    poucas centenas de pontos, independente da quantidade de amostras gravadas.
+    """
+    until_ts = time.time() if until_ts is None else until_ts
+    bucket_seconds = max(1.0, (until_ts - since_ts) / max_points)
+    with reading(METRICS_DB) as conn:
+        _ensure_schema(conn)
+        rows = conn.execute(
+            """
+            SELECT MIN(ts) AS ts, AVG(value) AS avg, MIN(value) AS min, MAX(value) AS max
+            FROM metric_samples
+            WHERE server = ? AND metric = ? AND ts >= ? AND ts <= ?
+            GROUP BY CAST((ts - ?) / ? AS INTEGER)
+            ORDER BY ts
+            """,
+            (server.upper(), metric, since_ts, until_ts, since_ts, bucket_seconds),
+        ).fetchall()
+    return {
+        "ts": [row["ts"] for row in rows],
+        "avg": [row["avg"] for row in rows],
+        "min": [row["min"] for row in rows],
+        "max": [row["max"] for row in rows],
+    }
+
+
+def query_events(server: str, metric: str, since_ts: float, until_ts: float | None = None) -> list[tuple[float, float]]:
+    """Amostras brutas de métricas esparsas (ex: restart), sem redução."""
+    until_ts = time.time() if until_ts is None else until_ts
+    with reading(METRICS_DB) as conn:
+        _ensure_schema(conn)
+        rows = conn.execute(
+            "SELECT ts, value FROM metric_samples WHERE server = ? AND metric = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (server.upper(), metric, since_ts, until_ts),
+        ).fetchall()
+    return [(row["ts"], row["value"]) for row in rows]
@@ -0,0 +1,61 @@
+# utils/navigation.py (Atalhos de Navegação Aprendidos por Servidor)
+
+import os
+import json
+import time
+import threading
+from config.settings import DATA_DIR
+
+# URLs resolvidas de telas internas, aprendidas após uma navegação bem-sucedida pelo menu:
+#   {"SERVIDOR": {"enviar": {"url": "https://.../index.php?...", "learned_at": 1736500000.0}}}
+# Com a URL conhecida, a tela é aberta com um único goto em vez de vários cliques no menu.
+NAVIGATION_FILE = os.path.join(DATA_DIR, "navigation.json")
+
+SEND_PAGE = "enviar"  # Tela Discador Automático -> Preditivo -> Enviar
+
+_CACHE: dict | None = None
+_LOCK = threading.Lock()
+
+
+def _load() -> dict:
+    global _CACHE
+    if _CACHE is None:
+        try:
+            with open(NAVIGATION_FILE, 'r', encoding='utf-8') as f:
+                _CACHE = json.load(f)
+        except (OSError, ValueError):
+            _CACHE = {}
+    return _CACHE
+
+
+def _save(state: dict):
+    os.makedirs(os.path.dirname(NAVIGATION_FILE), exist_ok=True)
+    temp_path = f"{NAVIGATION_FILE}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, NAVIGATION_FILE)
+
+
+def get_learned_url(server: str, page_key: str) -> str | None:
+    with _LOCK:
+        entry = _load().get(server.upper(), {}).get(page_key)
+    return entry["url"] if entry else None
+
+
+def record_learned_url(server: str, page_key: str, url: str):
+    """Grava a URL da tela (só escreve no disco quando ela muda)."""
+    with _LOCK:
+        state = _load()
+        pages = state.setdefault(server.upper(), {})
+        if pages.get(page_key, {}).get("url") == url:
+            return
+        pages[page_key] = {"url": url, "learned_at": time.time()}
+        _save(state)
+
+
+def forget_learned_url(server: str, page_key: str):
+    """Descarta a URL (o atalho falhou: a próxima navegação volta a usar o menu)."""
+    with _LOCK:
+        state = _load()
+        if state.get(server.upper(), {}).pop(page_key, None) is not None:
+            _save(state)
@@ -0,0 +1,208 @@
+# utils/scheduler.py (Agendador de Jobs com Heap de Timers)
+
+import os
+import json
+import heapq
+import asyncio
+import datetime
+import itertools
+from abc import ABC, abstractmethod
+from config.settings import DATA_DIR
+
+# Últimas execuções de cada job (sobrevive a restarts do container):
+#   {"importacao_diaria": "2025-01-10T11:00:00.412345", ...}
+SCHEDULER_STATE_FILE = os.path.join(DATA_DIR, "scheduler_state.json")
+
+# Teto de cada espera: reavalia o heap periodicamente mesmo sem jobs próximos
+# (protege contra saltos do relógio do sistema) sem virar polling.
+SCHEDULER_MAX_SLEEP_SECONDS = 60 * 60
+
+# Esperas maiores que isso são logadas (ex: monitor dormindo fora do expediente)
+SCHEDULER_LOG_IDLE_SECONDS = 5 * 60
+
+
+class Job(ABC):
+    """Job do agendador: nome, corotina sem argumentos e regra de próxima execução."""
+
+    persist_last_run = False  # Grava o marcador de última execução em SCHEDULER_STATE_FILE
+
+    def __init__(self, name: str, func, exclusive: bool = False):
+        self.name = name
+        self.func = func
+        # Job exclusivo espera os demais terminarem e nada mais começa enquanto ele roda
+        self.exclusive = exclusive
+
+    @abstractmethod
+    def initial_run(self, now: datetime.datetime, last_run: datetime.datetime | None) -> datetime.datetime:
+        """Primeira execução ao iniciar o agendador (last_run: marcador persistido, se houver)."""
+
+    @abstractmethod
+    def next_run_after(self, moment: datetime.datetime) -> datetime.datetime:
+        """Próxima execução depois de moment."""
+
+
+class IntervalJob(Job):
+    """
+    Roda a cada interval_seconds, contados do fim da execução anterior. interval_seconds
+    pode ser um número fixo ou uma função sem argumentos (intervalo recalculado a cada execução).
+    window(momento) devolve o próprio momento se estiver dentro da janela permitida
+    ou o início da próxima janela (fora dela o job dorme até lá, sem acordar à toa).
+    """
+
+    def __init__(self, name: str, func, interval_seconds, window=None, exclusive: bool = False):
+        super().__init__(name, func, exclusive)
+        self.interval_seconds = interval_seconds
+        self.window = window
+
+    def _allowed(self, moment: datetime.datetime) -> datetime.datetime:
+        return self.window(moment) if self.window else moment
+
+    def initial_run(self, now, last_run):
+        return self._allowed(now)
+
+    def next_run_after(self, moment):
+        interval = self.interval_seconds() if callable(self.interval_seconds) else self.interval_seconds
+        return self._allowed(moment + datetime.timedelta(seconds=interval))
+
+
+class DailyJob(Job):
+    """
+    Roda uma vez por dia no horário hour:minute, nos dias da semana indicados (segunda=0).
+    Se a execução do dia foi perdida (container fora do ar, ciclo longo), roda assim que
+    possível, desde que o atraso não passe de catch_up_seconds. Só recupera com marcador
+    gravado: sem histórico (primeiro deploy, DATA_DIR efêmero) não há como saber se a
+    execução do dia já aconteceu, e repetir finalizar + importar no meio do dia é pior.
+    """
+
+    persist_last_run = True
+
+    def __init__(self, name: str, func, hour: int, minute: int = 0, weekdays=range(7),
+                 catch_up_seconds: float = 0, exclusive: bool = False):
+        super().__init__(name, func, exclusive)
+        self.hour = hour
+        self.minute = minute
+        self.weekdays = set(weekdays)
+        self.catch_up_seconds = catch_up_seconds
+
+    def _occurrence(self, day: datetime.date) -> datetime.datetime:
+        return datetime.datetime.combine(day, datetime.time(self.hour, self.minute))
+
+    def next_run_after(self, moment):
+        for offset in range(8):
+            day = moment.date() + datetime.timedelta(days=offset)
+            if day.weekday() in self.weekdays and self._occurrence(day) > moment:
+                return self._occurrence(day)
+        raise ValueError(f"Job '{self.name}' sem dias da semana configurados.")
+
+    def previous_run(self, moment: datetime.datetime) -> datetime.datetime | None:
+        for offset in range(8):
+            day = moment.date() - datetime.timedelta(days=offset)
+            if day.weekday() in self.weekdays and self._occurrence(day) <= moment:
+                return self._occurrence(day)
+        return None
+
+    def initial_run(self, now, last_run):
+        previous = self.previous_run(now)
+        missed = previous is not None and last_run is not None and last_run < previous
+        if missed and (now - previous).total_seconds() <= self.catch_up_seconds:
+            print(f"--- [AGENDADOR] '{self.name}' perdido às {previous.strftime('%d/%m %H:%M')}. "
+                  f"Executando agora (recuperação). ---")
+            return now
+        return self.next_run_after(now)
+
+
+class JobScheduler:
+    """
+    Loop único com heap de (próxima execução, job): dorme exatamente até o próximo job.
+    Jobs comuns rodam como tasks (um job nunca se sobrepõe a si mesmo, pois só é
+    reagendado ao terminar); jobs exclusivos rodam sozinhos.
+    """
+
+    def __init__(self, jobs: list[Job], state_file: str = SCHEDULER_STATE_FILE):
+        self.jobs = jobs
+        self.state_file = state_file
+        self._heap: list[tuple[datetime.datetime, int, Job]] = []
+        self._sequence = itertools.count()
+        self._running: dict[str, asyncio.Task] = {}
+        self._wakeup: asyncio.Event | None = None
+
+    # --- MARCADORES DE ÚLTIMA EXECUÇÃO ---
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get_last_run(self, job: Job) -> datetime.datetime | None:
+        value = self._load_state().get(job.name)
+        return datetime.datetime.fromisoformat(value) if value else None
+
+    def _save_last_run(self, job: Job, started_at: datetime.datetime):
+        state = self._load_state()
+        state[job.name] = started_at.isoformat()
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        temp_path = f"{self.state_file}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_file)
+
+    # --- HEAP ---
+    def schedule(self, job: Job, run_at: datetime.datetime):
+        heapq.heappush(self._heap, (run_at, next(self._sequence), job))
+        delay = (run_at - datetime.datetime.now()).total_seconds()
+        if delay > SCHEDULER_LOG_IDLE_SECONDS:
+            print(f"--- [AGENDADOR] Próxima execução de '{job.name}': {run_at.strftime('%d/%m %H:%M:%S')} ---")
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_job(self, job: Job):
+        started_at = datetime.datetime.now()
+        # Marcador gravado no início: um crash no meio não dispara o job de novo na recuperação
+        if job.persist_last_run:
+            self._save_last_run(job, started_at)
+        try:
+            await job.func()
+        except Exception as e:
+            print(f"--- [AGENDADOR] ❌ Job '{job.name}' falhou: {e} ---")
+        finally:
+            self._running.pop(job.name, None)
+            self.schedule(job, job.next_run_after(datetime.datetime.now()))
+
+    async def run_forever(self):
+        self._wakeup = asyncio.Event()
+        now = datetime.datetime.now()
+        for job in self.jobs:
+            self.schedule(job, job.initial_run(now, self.get_last_run(job)))
+
+        try:
+            while True:
+                if not self._heap:
+                    # Todos os jobs estão rodando: aguarda algum terminar e reagendar
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                run_at, _, job = self._heap[0]
+                delay = (run_at - datetime.datetime.now()).total_seconds()
+                if delay > 0:
+                    # Dorme até o próximo job (ou até um job terminar e reagendar)
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, SCHEDULER_MAX_SLEEP_SECONDS))
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                heapq.heappop(self._heap)
+                if job.exclusive:
+                    if self._running:
+                        await asyncio.gather(*self._running.values(), return_exceptions=True)
+                    await self._run_job(job)
+                else:
+                    self._running[job.name] = asyncio.create_task(self._run_job(job))
+        finally:
+            for task in list(self._running.values()):
+                task.cancel()
+            if self._running:
+                await asyncio.gather(*self._running.values(), return_exceptions=True)
@@ -0,0 +1,45 @@
+# utils/step_timer.py (Cronômetro por Etapa com Orçamento de Latência)
+
+import time
+
+
+class StepTimer:
+    """
+    Mede cada etapa de uma rotina (lap) e imprime o detalhamento no fim,
+    destacando quando o total estoura o orçamento de latência.
+    """
+
+    def __init__(self, label: str, budget_seconds: float | None = None):
+        self.label = label
+        self.budget_seconds = budget_seconds
+        self.steps: list[tuple[str, float]] = []
+        self._started_at = time.perf_counter()
+        self._last_lap = self._started_at
+
+    def lap(self, step_name: str) -> float:
+        """Fecha a etapa atual (tempo desde o último lap) e devolve sua duração em segundos."""
+        now = time.perf_counter()
+        duration = now - self._last_lap
+        self.steps.append((step_name, duration))
+        self._last_lap = now
+        return duration
+
+    @property
+    def total_seconds(self) -> float:
+        return self._last_lap - self._started_at
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget_seconds is not None and self.total_seconds > self.budget_seconds
+
+    def summary(self) -> str:
+        breakdown = " · ".join(f"{name} {duration:.1f}s" for name, duration in self.steps)
+        budget = f" (orçamento {self.budget_seconds:.0f}s)" if self.budget_seconds is not None else ""
+        return f"{self.total_seconds:.1f}s{budget} | {breakdown}"
+
+    def report(self):
+        icon = "⚠️" if self.over_budget else "⏱️"
+        print(f"[{self.label}] {icon} Tempo por etapa: {self.summary()}")
+        if self.over_budget:
+            print(f"[{self.label}] ⚠️ Orçamento de latência estourado em "
+                  f"{self.total_seconds - self.budget_seconds:.1f}s.")